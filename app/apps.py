@@ -5,3 +5,7 @@ class AppConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'app'
     verbose_name = 'Portfolio App'
+
+    def ready(self):
+        # Connect the content invalidation signals
+        from . import signals  # noqa: F401
@@ -0,0 +1,219 @@
+"""
+Two-tier cache backend.
+
+L1 is a bounded in-process LRU (per worker), sized in bytes of pickled
+values. L2 is another configured cache alias that every worker shares
+(file-based or Redis, see CACHES in settings.py). Reads try L1 first and
+fill it from L2; writes go to both. L1 entries are kept for at most
+``L1_TIMEOUT`` seconds, which bounds how long one worker can miss another
+worker's write.
+
+Hit/miss/eviction counters are kept per process and can be read with
+``cache.stats()``.
+
+FileCache is the file-based L2 used without Redis. Its ``add()`` is atomic
+across processes, as Redis' SET NX is, so locks taken with it (the page
+cache's single-flight lock) hold across gunicorn workers.
+"""
+import os
+import pickle
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+
+from django.core.cache import caches
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+from django.core.cache.backends.filebased import FileBasedCache
+
+_MISSING = object()
+
+
+class LRUStore:
+    """Thread-safe LRU mapping bounded by the total size of its values"""
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        """Return the pickled value for key, or None"""
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None:
+                data, expires_at = entry
+                if expires_at > time.monotonic():
+                    self._data.move_to_end(key)
+                    self.hits += 1
+                    return data
+                self._remove(key)
+            self.misses += 1
+            return None
+
+    def set(self, key, data, ttl):
+        with self._lock:
+            self._remove(key)
+            if len(data) > self.max_bytes:
+                # Too large to ever fit; leave it to L2
+                return
+            self._data[key] = (data, time.monotonic() + ttl)
+            self.size += len(data)
+            while self.size > self.max_bytes:
+                oldest = next(iter(self._data))
+                self._remove(oldest)
+                self.evictions += 1
+
+    def delete(self, key):
+        with self._lock:
+            self._remove(key)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self.size = 0
+
+    def __len__(self):
+        return len(self._data)
+
+    def _remove(self, key):
+        entry = self._data.pop(key, None)
+        if entry is not None:
+            self.size -= len(entry[0])
+
+
+class FileCache(FileBasedCache):
+    """FileBasedCache with an add() that only one process can win"""
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        # FileBasedCache.add() checks, then sets: two processes can both add.
+        # Here the entry is written to a temporary file and hard-linked into
+        # place, which fails if the name already exists.
+        if self.has_key(key, version):  # also removes an expired entry
+            return False
+        self._createdir()
+        fname = self._key_to_file(key, version)
+        self._cull()
+        fd, tmp_path = tempfile.mkstemp(dir=self._dir)
+        try:
+            with open(fd, 'wb') as f:
+                self._write_content(f, timeout, value)
+            os.link(tmp_path, fname)
+            return True
+        except FileExistsError:
+            return False
+        finally:
+            os.remove(tmp_path)
+
+
+class TieredCache(BaseCache):
+    """
+    Cache backend combining an in-process LRU (L1) with a shared cache (L2).
+
+    OPTIONS:
+        L2              alias of the shared cache in CACHES (default "shared")
+        L1_MAX_BYTES    size bound of the per-process LRU (default 32 MB)
+        L1_TIMEOUT      longest an entry stays in L1, in seconds (default 5)
+    """
+
+    def __init__(self, location, params):
+        options = dict(params.get('OPTIONS') or {})
+        self._l2_alias = options.pop('L2', 'shared')
+        self._l1_timeout = float(options.pop('L1_TIMEOUT', 5))
+        self._l1 = LRUStore(int(options.pop('L1_MAX_BYTES', 32 * 1024 * 1024)))
+        super().__init__({**params, 'OPTIONS': options})
+        self.l2_hits = 0
+        self.l2_misses = 0
+
+    @property
+    def l2(self):
+        return caches[self._l2_alias]
+
+    def _l1_ttl(self, timeout):
+        timeout = self.get_backend_timeout(timeout)
+        if timeout is None:
+            return self._l1_timeout
+        return max(0, min(timeout - time.time(), self._l1_timeout))
+
+    def _fill(self, key, value, timeout=DEFAULT_TIMEOUT):
+        ttl = self._l1_ttl(timeout)
+        if ttl > 0:
+            self._l1.set(key, pickle.dumps(value, pickle.HIGHEST_PROTOCOL), ttl)
+
+    def get(self, key, default=None, version=None):
+        l1_key = self.make_and_validate_key(key, version=version)
+        data = self._l1.get(l1_key)
+        if data is not None:
+            return pickle.loads(data)
+
+        value = self.l2.get(key, _MISSING, version=version)
+        if value is _MISSING:
+            self.l2_misses += 1
+            return default
+        self.l2_hits += 1
+        # The L2 entry's remaining lifetime is unknown, so L1 keeps it for
+        # L1_TIMEOUT at most
+        self._fill(l1_key, value, timeout=None)
+        return value
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        l1_key = self.make_and_validate_key(key, version=version)
+        self.l2.set(key, value, timeout=timeout, version=version)
+        self._fill(l1_key, value, timeout)
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        l1_key = self.make_and_validate_key(key, version=version)
+        added = self.l2.add(key, value, timeout=timeout, version=version)
+        if added:
+            self._fill(l1_key, value, timeout)
+        else:
+            # Someone else's value is in L2; don't shadow it
+            self._l1.delete(l1_key)
+        return added
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        self._l1.delete(self.make_and_validate_key(key, version=version))
+        return self.l2.touch(key, timeout=timeout, version=version)
+
+    def delete(self, key, version=None):
+        self._l1.delete(self.make_and_validate_key(key, version=version))
+        return self.l2.delete(key, version=version)
+
+    def has_key(self, key, version=None):
+        if self._l1.get(self.make_and_validate_key(key, version=version)) is not None:
+            return True
+        return self.l2.has_key(key, version=version)
+
+    def incr(self, key, delta=1, version=None):
+        self._l1.delete(self.make_and_validate_key(key, version=version))
+        return self.l2.incr(key, delta, version=version)
+
+    def clear(self):
+        # Other workers' L1 entries expire within L1_TIMEOUT
+        self._l1.clear()
+        self.l2.clear()
+
+    def close(self, **kwargs):
+        self.l2.close(**kwargs)
+
+    def stats(self):
+        """Per-process counters for sizing the cache from real traffic"""
+        return {
+            'l1': {
+                'hits': self._l1.hits,
+                'misses': self._l1.misses,
+                'evictions': self._l1.evictions,
+                'entries': len(self._l1),
+                'bytes': self._l1.size,
+                'max_bytes': self._l1.max_bytes,
+            },
+            'l2': {
+                'alias': self._l2_alias,
+                'hits': self.l2_hits,
+                'misses': self.l2_misses,
+            },
+        }
@@ -0,0 +1,503 @@
+"""
+Content snapshot layer for the public pages.
+
+The portfolio content only changes when someone edits it in the admin, so
+instead of querying every table on every page view we build the whole render
+context once and keep it in memory as an immutable snapshot. Each snapshot is
+stamped with the content version it was built from; saving or deleting any
+content model bumps the version (see app/signals.py) and the next request
+rebuilds the snapshot.
+
+The version itself lives in the shared cache (CONTENT_VERSION_CACHE) so
+that every worker sees the same value.
+
+Next to it, every content model has a version of its own that only moves
+when that model changes. Sections of index.html are cached as template
+fragments keyed on the versions of the models they show (SECTION_MODELS),
+so editing a testimonial re-renders the testimonials and nothing else.
+"""
+import asyncio
+import threading
+import time
+import weakref
+from dataclasses import dataclass
+from datetime import datetime, timezone
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import caches
+
+from .pagecache import FRAGMENT_CACHE_TIMEOUT, get_build_id
+from .themecss import ensure_theme_css
+
+CONTENT_VERSION_KEY = 'content:version'
+MODEL_VERSION_KEY = 'content:version:{}'
+
+# Cached sections of index.html (templates/sections/) and the models they show
+SECTION_MODELS = {
+    'qualifications': ('sitesettings', 'education', 'experience'),
+    'skills': ('sitesettings', 'skill'),
+    'work': ('sitesettings', 'project'),
+    'services': ('sitesettings', 'service'),
+    'testimonials': ('sitesettings', 'testimonial'),
+}
+SECTION_MODEL_NAMES = tuple(sorted({name for names in SECTION_MODELS.values() for name in names}))
+
+# Icon shown next to each skill category tab in index.html
+SKILL_CATEGORY_ICONS = {
+    'frontend': 'uil uil-brackets-curly',
+    'backend': 'uil uil-server-network',
+    'databases': 'uil uil-database',
+    'apis': 'uil uil-plug',
+    'cloud': 'uil uil-cloud',
+    'infrastructure': 'uil uil-layer-group',
+    'cicd': 'uil uil-cog',
+    'containers': 'uil uil-docker',
+    'monitoring': 'uil uil-chart-line',
+    'security': 'uil uil-shield-check',
+    'tools': 'uil uil-swatchbook',
+    'other': 'uil uil-plus-circle',
+}
+
+_snapshot = None
+_snapshot_lock = threading.Lock()
+# One asyncio.Lock per event loop (a lock can't be shared between loops)
+_async_snapshot_locks = weakref.WeakKeyDictionary()
+
+
+def _version_cache():
+    return caches[getattr(settings, 'CONTENT_VERSION_CACHE', 'default')]
+
+
+def get_content_version():
+    """Return the current content version, initialising it if needed"""
+    cache = _version_cache()
+    version = cache.get(CONTENT_VERSION_KEY)
+    if version is None:
+        # add() keeps the first writer's value if several workers race here
+        cache.add(CONTENT_VERSION_KEY, time.time_ns(), timeout=None)
+        version = cache.get(CONTENT_VERSION_KEY)
+    return version
+
+
+async def aget_content_version():
+    """Async variant of get_content_version()"""
+    cache = _version_cache()
+    version = await cache.aget(CONTENT_VERSION_KEY)
+    if version is None:
+        await cache.aadd(CONTENT_VERSION_KEY, time.time_ns(), timeout=None)
+        version = await cache.aget(CONTENT_VERSION_KEY)
+    return version
+
+
+def bump_content_version(*models):
+    """Mark cached content as stale and return the new version
+
+    The snapshot and whole pages always go stale. Cached sections only do
+    if they show one of ``models`` (any model when none are given).
+    """
+    # A fresh timestamp rather than incr(): two workers bumping at once still
+    # end up with a version that no snapshot was built from.
+    cache = _version_cache()
+    current = cache.get(CONTENT_VERSION_KEY) or 0
+    version = max(time.time_ns(), current + 1)
+    names = {model._meta.model_name for model in models} if models else SECTION_MODEL_NAMES
+    cache.set_many(
+        {CONTENT_VERSION_KEY: version, **{MODEL_VERSION_KEY.format(name): version for name in names}},
+        timeout=None,
+    )
+    return version
+
+
+def get_model_versions():
+    """Return {model name: version} for the models shown in cached sections"""
+    cache = _version_cache()
+    keys = {MODEL_VERSION_KEY.format(name): name for name in SECTION_MODEL_NAMES}
+    versions = cache.get_many(keys)
+    for key in keys.keys() - versions.keys():
+        cache.add(key, time.time_ns(), timeout=None)
+        versions[key] = cache.get(key)
+    return {keys[key]: version for key, version in versions.items()}
+
+
+async def aget_model_versions():
+    """Async variant of get_model_versions()"""
+    cache = _version_cache()
+    keys = {MODEL_VERSION_KEY.format(name): name for name in SECTION_MODEL_NAMES}
+    versions = await cache.aget_many(keys)
+    for key in keys.keys() - versions.keys():
+        await cache.aadd(key, time.time_ns(), timeout=None)
+        versions[key] = await cache.aget(key)
+    return {keys[key]: version for key, version in versions.items()}
+
+
+def format_etag(version):
+    return f'"v{version:x}"'
+
+
+def content_etag(request=None):
+    """ETag for responses that depend only on the content version"""
+    return format_etag(get_content_version())
+
+
+def content_last_modified(request=None):
+    """Last-Modified for responses that depend only on the content version"""
+    # Versions are nanosecond timestamps of the last bump
+    return datetime.fromtimestamp(get_content_version() / 1e9, tz=timezone.utc)
+
+
+@dataclass(frozen=True)
+class SkillCategory:
+    """One skill category bucket with its skills in display order"""
+
+    key: str
+    label: str
+    icon: str
+    skills: tuple
+
+    @property
+    def count(self):
+        return len(self.skills)
+
+    def __bool__(self):
+        return bool(self.skills)
+
+    def __iter__(self):
+        return iter(self.skills)
+
+    def __len__(self):
+        return len(self.skills)
+
+
+class SkillIndex:
+    """
+    Skills grouped by category, in the order of the Skill.category choices.
+
+    Built from a single pass over already fetched skills. Iterating yields
+    the non-empty categories; ``index.frontend`` / ``index['frontend']``
+    return a category bucket (empty if it has no skills), and ``first`` is
+    the first non-empty category, i.e. the tab that starts out active.
+    """
+
+    def __init__(self, skills):
+        from .models import Skill
+
+        buckets = {key: [] for key, _label in Skill._meta.get_field('category').choices}
+        for skill in skills:
+            buckets.setdefault(skill.category, []).append(skill)
+
+        labels = dict(Skill._meta.get_field('category').choices)
+        self._categories = {
+            key: SkillCategory(
+                key=key,
+                label=labels.get(key, key.title()),
+                icon=SKILL_CATEGORY_ICONS.get(key, SKILL_CATEGORY_ICONS['other']),
+                skills=tuple(members),
+            )
+            for key, members in buckets.items()
+        }
+        self.categories = tuple(category for category in self._categories.values() if category)
+        self.first = self.categories[0] if self.categories else None
+
+    def __getitem__(self, key):
+        return self._categories[key]
+
+    def __getattr__(self, key):
+        try:
+            return self.__dict__['_categories'][key]
+        except KeyError:
+            raise AttributeError(key) from None
+
+    def __iter__(self):
+        return iter(self.categories)
+
+    def __len__(self):
+        return len(self.categories)
+
+    def __bool__(self):
+        return bool(self.categories)
+
+    def counts(self):
+        """List of {key, label, count} for every non-empty category"""
+        return [
+            {'key': category.key, 'label': category.label, 'count': category.count}
+            for category in self.categories
+        ]
+
+
+@dataclass(frozen=True)
+class ContentSnapshot:
+    """Immutable, fully evaluated content for one content version"""
+
+    version: int
+    site_settings: object
+    theme: object
+    skills: tuple
+    skills_by_category: SkillIndex
+    projects: tuple
+    experiences: tuple
+    education: tuple
+    services: tuple
+    testimonials: tuple
+    landing_sections: tuple
+    model_versions: dict
+
+    def section_keys(self):
+        """{section: cache key part} for the cached sections of index.html"""
+        # The build id keeps fragments rendered by older templates out
+        build_id = get_build_id()
+        return {
+            section: '.'.join([build_id, *(f'{self.model_versions.get(name, 0):x}' for name in names)])
+            for section, names in SECTION_MODELS.items()
+        }
+
+    def as_context(self):
+        """Template context for index.html"""
+        return {
+            'site_settings': self.site_settings,
+            'theme': self.theme,
+            'skills': self.skills,
+            'skills_by_category': self.skills_by_category,
+            'projects': self.projects,
+            'experiences': self.experiences,
+            'education': self.education,
+            'services': self.services,
+            'testimonials': self.testimonials,
+            'landing_sections': self.landing_sections,
+            'content_version': self.version,
+            # Same document and ETag as /api/theme/, so the page needs no fetch
+            'theme_payload': build_theme_payload(self),
+            'content_etag': format_etag(self.version),
+            'fragments': self.section_keys(),
+            'fragment_timeout': FRAGMENT_CACHE_TIMEOUT,
+        }
+
+
+def ensure_defaults():
+    """Return (site_settings, theme), creating the defaults if missing"""
+    from .models import SiteSettings, ThemeSettings
+
+    site_settings = SiteSettings.objects.first()
+    if not site_settings:
+        site_settings = SiteSettings.objects.create()
+
+    theme = ThemeSettings.objects.filter(is_active=True).first()
+    if not theme:
+        theme = ThemeSettings.objects.create(name="Default Theme", is_active=True)
+
+    return site_settings, theme
+
+
+async def aensure_defaults():
+    """Async variant of ensure_defaults()"""
+    from .models import SiteSettings, ThemeSettings
+
+    site_settings = await SiteSettings.objects.afirst()
+    if not site_settings:
+        site_settings = await SiteSettings.objects.acreate()
+
+    theme = await ThemeSettings.objects.filter(is_active=True).afirst()
+    if not theme:
+        theme = await ThemeSettings.objects.acreate(name="Default Theme", is_active=True)
+
+    return site_settings, theme
+
+
+def content_querysets():
+    """The public list queries, keyed by snapshot field"""
+    # Each one is served by a partial index on (order, ...) WHERE is_active
+    # (see Meta.indexes in app/models.py and manage.py explain_queries)
+    from .models import Skill, Project, Experience, Education, LandingPageSection, Service, Testimonial
+
+    return {
+        'skills': Skill.objects.filter(is_active=True).order_by('order', 'name'),
+        'projects': Project.objects.filter(is_active=True).order_by('order', '-created_at'),
+        'experiences': Experience.objects.filter(is_active=True).order_by('order', '-start_date'),
+        'education': Education.objects.filter(is_active=True).order_by('order', '-start_date'),
+        'services': Service.objects.filter(is_active=True).order_by('order', 'title'),
+        'testimonials': Testimonial.objects.filter(is_active=True).order_by('order', 'date'),
+        'landing_sections': LandingPageSection.objects.filter(is_active=True).order_by('order', 'title'),
+    }
+
+
+def build_snapshot():
+    """Query every content table once and return a new snapshot"""
+    site_settings, theme = ensure_defaults()
+    ensure_theme_css(theme)
+    # Read the version before the content: an edit that lands while we are
+    # querying then leaves this snapshot labelled as stale, never the reverse.
+    version = get_content_version()
+    model_versions = get_model_versions()
+
+    content = {name: tuple(queryset) for name, queryset in content_querysets().items()}
+    return ContentSnapshot(
+        version=version,
+        site_settings=site_settings,
+        theme=theme,
+        skills_by_category=SkillIndex(content['skills']),
+        model_versions=model_versions,
+        **content,
+    )
+
+
+async def _afetch(queryset):
+    return tuple([obj async for obj in queryset])
+
+
+async def abuild_snapshot():
+    """Async variant of build_snapshot(): the queries are issued concurrently"""
+    version = await aget_content_version()
+    model_versions = await aget_model_versions()
+    querysets = content_querysets()
+    (site_settings, theme), *rows = await asyncio.gather(
+        aensure_defaults(),
+        *(_afetch(queryset) for queryset in querysets.values()),
+    )
+    content = dict(zip(querysets, rows))
+    await sync_to_async(ensure_theme_css)(theme)
+    return ContentSnapshot(
+        version=version,
+        site_settings=site_settings,
+        theme=theme,
+        skills_by_category=SkillIndex(content['skills']),
+        model_versions=model_versions,
+        **content,
+    )
+
+
+def get_snapshot():
+    """Return the snapshot for the current content version, rebuilding if stale"""
+    global _snapshot
+
+    version = get_content_version()
+    snapshot = _snapshot
+    if snapshot is not None and snapshot.version == version:
+        return snapshot
+
+    with _snapshot_lock:
+        # Another thread may have rebuilt it while we waited for the lock
+        snapshot = _snapshot
+        if snapshot is None or snapshot.version != get_content_version():
+            snapshot = build_snapshot()
+            _snapshot = snapshot
+    return snapshot
+
+
+def snapshot_version():
+    """Version of the snapshot this process holds (None before the first), without a cache lookup"""
+    snapshot = _snapshot
+    return snapshot.version if snapshot is not None else None
+
+
+async def aget_snapshot():
+    """Async variant of get_snapshot()"""
+    global _snapshot
+
+    version = await aget_content_version()
+    snapshot = _snapshot
+    if snapshot is not None and snapshot.version == version:
+        return snapshot
+
+    loop = asyncio.get_running_loop()
+    lock = _async_snapshot_locks.get(loop)
+    if lock is None:
+        lock = _async_snapshot_locks.setdefault(loop, asyncio.Lock())
+    async with lock:
+        snapshot = _snapshot
+        if snapshot is None or snapshot.version != await aget_content_version():
+            snapshot = await abuild_snapshot()
+            _snapshot = snapshot
+    return snapshot
+
+
+def build_theme_payload(snapshot):
+    """The /api/theme/ document for a content snapshot"""
+    theme = snapshot.theme
+    site_settings = snapshot.site_settings
+    return {
+        'colors': {
+            'primary': theme.primary_color,
+            'secondary': theme.secondary_color,
+            'accent': theme.accent_color,
+            'background': theme.background_color,
+            'text': theme.text_color,
+            'card': theme.card_color,
+        },
+        'typography': {
+            'font_family': theme.font_family,
+            'heading_font': theme.heading_font,
+            'font_size_base': theme.font_size_base,
+        },
+        'layout': {
+            'sidebar_width': theme.sidebar_width,
+            'border_radius': theme.border_radius,
+            'spacing_unit': theme.spacing_unit,
+        },
+        'animations': {
+            'enabled': theme.enable_animations,
+            'speed': theme.animation_speed,
+            'stars': theme.enable_stars,
+        },
+        'custom_css': theme.custom_css,
+        'stylesheet': theme.compiled_css_url or None,
+        'site': {
+            'title': site_settings.site_title,
+            'description': site_settings.site_description,
+            'email': site_settings.email,
+            'phone': site_settings.phone,
+            'location': site_settings.location,
+            'social': {
+                'facebook': site_settings.facebook_url,
+                'instagram': site_settings.instagram_url,
+                'twitter': site_settings.twitter_url,
+                'linkedin': site_settings.linkedin_url,
+                'github': site_settings.github_url,
+            }
+        },
+        'personal': {
+            'full_name': site_settings.full_name,
+            'job_title': site_settings.job_title,
+            'bio': site_settings.bio,
+            'profile_image': site_settings.profile_image.url if site_settings.profile_image else None,
+            'about_title': site_settings.about_title,
+            'about_description': site_settings.about_description,
+        },
+        'skills': [
+            {
+                'name': skill.name,
+                'category': skill.category,
+                'proficiency': skill.proficiency,
+            } for skill in snapshot.skills
+        ],
+        'skill_categories': snapshot.skills_by_category.counts(),
+        'projects': [
+            {
+                'title': project.title,
+                'description': project.description,
+                'image': project.image.url if project.image else None,
+                'technologies': project.technologies,
+                'demo_url': project.demo_url,
+                'github_url': project.github_url,
+            } for project in snapshot.projects
+        ],
+        'experience': [
+            {
+                'title': exp.title,
+                'company': exp.company,
+                'description': exp.description,
+                'start_date': exp.start_date.strftime('%Y-%m-%d'),
+                'end_date': exp.end_date.strftime('%Y-%m-%d') if exp.end_date else None,
+                'is_current': exp.is_current,
+            } for exp in snapshot.experiences
+        ],
+        'education': [
+            {
+                'degree': edu.degree,
+                'institution': edu.institution,
+                'description': edu.description,
+                'start_date': edu.start_date.strftime('%Y-%m-%d'),
+                'end_date': edu.end_date.strftime('%Y-%m-%d') if edu.end_date else None,
+                'is_current': edu.is_current,
+            } for edu in snapshot.education
+        ]
+    }
@@ -0,0 +1,254 @@
+"""
+Synthetic content for load and scaling tests.
+
+Rows are produced lazily as plain dicts of field values and inserted with
+``executemany`` in fixed-size batches, so memory stays flat no matter how many
+rows are requested. Building model instances for ``bulk_create`` spent most
+of the time in ``Model.__init__``; the raw INSERT is several times faster.
+Work is split into chunks; each chunk draws from its own ``random.Random``
+seeded from (seed, model, chunk start), so the same seed and chunk size always
+give the same rows, whether the chunks run in one process or in several.
+
+Nothing here sends post_save, so callers are responsible for bumping the
+content version once they are done (``generate()`` does).
+"""
+import itertools
+import multiprocessing
+import os
+import random
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import date, timedelta
+from functools import partial
+
+from django.core.management.color import no_style
+from django.db import connection, connections, router, transaction
+from django.db.models import DateField, DateTimeField
+from django.utils import timezone
+
+from .content import bump_content_version
+from .models import Skill, Project, Experience, Education, LandingPageSection, Service, Testimonial
+
+DEFAULT_BATCH_SIZE = 2000
+DEFAULT_CHUNK_SIZE = 50000
+
+WORDS = (
+    'scalable', 'responsive', 'accessible', 'realtime', 'distributed', 'secure', 'modern', 'lightweight',
+    'platform', 'dashboard', 'pipeline', 'service', 'interface', 'workflow', 'analytics', 'storefront',
+    'design', 'migration', 'automation', 'integration', 'performance', 'monitoring', 'deployment', 'cache',
+    'users', 'teams', 'customers', 'data', 'reports', 'payments', 'search', 'content',
+)
+TECHNOLOGIES = (
+    'Python', 'Django', 'PostgreSQL', 'Redis', 'React', 'Vue', 'TypeScript', 'Docker', 'Kubernetes',
+    'AWS', 'Terraform', 'GraphQL', 'Celery', 'Nginx', 'Tailwind', 'Node.js', 'Go', 'Sass',
+)
+FIRST_NAMES = ('Alex', 'Sam', 'Jordan', 'Taylor', 'Morgan', 'Riley', 'Casey', 'Jamie', 'Avery', 'Quinn', 'Robin', 'Drew')
+LAST_NAMES = ('Khan', 'Garcia', 'Nguyen', 'Smith', 'Okafor', 'Rossi', 'Kim', 'Novak', 'Silva', 'Haddad', 'Larsen', 'Patel')
+COMPANIES = ('Acme', 'Globex', 'Initech', 'Umbrella', 'Stark', 'Wayne', 'Hooli', 'Vandelay', 'Wonka', 'Tyrell')
+POSITIONS = ('Product Manager', 'CTO', 'Founder', 'Engineering Lead', 'Designer', 'Marketing Director')
+DEGREES = ('BSc Computer Science', 'MSc Software Engineering', 'BA Interaction Design', 'Web Development Bootcamp')
+ICONS = ('uil uil-web-grid', 'uil uil-arrow', 'uil uil-pen', 'uil uil-server-network', 'uil uil-mobile-android')
+SKILL_CATEGORIES = [key for key, _label in Skill._meta.get_field('category').choices]
+SECTION_TYPES = [key for key, _label in LandingPageSection.SECTION_TYPES]
+EPOCH = date(2000, 1, 1)
+
+
+def _sentence(rng, words=12):
+    return ' '.join(rng.choices(WORDS, k=words)).capitalize() + '.'
+
+
+def _date(rng):
+    return EPOCH + timedelta(days=rng.randrange(9000))
+
+
+def make_skill(rng, i):
+    return dict(
+        name=f'{rng.choice(TECHNOLOGIES)} {i}',
+        category=rng.choice(SKILL_CATEGORIES),
+        proficiency=rng.randint(40, 100),
+        hide_proficiency=rng.random() < 0.1,
+        order=i,
+    )
+
+
+def make_project(rng, i):
+    return dict(
+        title=f'{rng.choice(WORDS).capitalize()} {rng.choice(WORDS)} {i}',
+        description=_sentence(rng, 30),
+        technologies=', '.join(rng.sample(TECHNOLOGIES, 4)),
+        demo_url=f'https://demo.example.com/{i}',
+        github_url=f'https://github.com/example/project-{i}',
+        order=i,
+    )
+
+
+def make_experience(rng, i):
+    start = _date(rng)
+    is_current = rng.random() < 0.1
+    return dict(
+        title=rng.choice(POSITIONS),
+        company=f'{rng.choice(COMPANIES)} {i}',
+        description=_sentence(rng, 25),
+        start_date=start,
+        end_date=None if is_current else start + timedelta(days=rng.randrange(90, 1500)),
+        is_current=is_current,
+        order=i,
+    )
+
+
+def make_education(rng, i):
+    start = _date(rng)
+    return dict(
+        degree=rng.choice(DEGREES),
+        institution=f'{rng.choice(LAST_NAMES)} University {i}',
+        description=_sentence(rng, 10),
+        start_date=start,
+        end_date=start + timedelta(days=365 * rng.randint(1, 4)),
+        order=i,
+    )
+
+
+def make_service(rng, i):
+    return dict(
+        title=f'{rng.choice(WORDS).capitalize()} {rng.choice(WORDS)} {i}',
+        description=_sentence(rng, 20),
+        icon_class=rng.choice(ICONS),
+        order=i,
+    )
+
+
+def make_testimonial(rng, i):
+    return dict(
+        name=f'{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}',
+        position=rng.choice(POSITIONS),
+        company=rng.choice(COMPANIES),
+        testimonial_text=_sentence(rng, 35),
+        date=_date(rng),
+        rating=rng.randint(3, 5),
+        order=i,
+    )
+
+
+def make_landing_section(rng, i):
+    return dict(
+        title=f'{rng.choice(WORDS).capitalize()} {i}',
+        subtitle=_sentence(rng, 5),
+        section_type=rng.choice(SECTION_TYPES),
+        content=f'<p>{_sentence(rng, 40)}</p>',
+        icon_class=rng.choice(ICONS),
+        order=i,
+    )
+
+
+# Name used on the command line -> (model, row factory)
+GENERATORS = {
+    'skills': (Skill, make_skill),
+    'projects': (Project, make_project),
+    'experiences': (Experience, make_experience),
+    'education': (Education, make_education),
+    'services': (Service, make_service),
+    'testimonials': (Testimonial, make_testimonial),
+    'landing_sections': (LandingPageSection, make_landing_section),
+}
+
+
+def generate_rows(name, start, stop, seed):
+    """Lazily yield the field values ({attname: value}) of rows ``start``..``stop - 1`` of ``name``"""
+    _model, factory = GENERATORS[name]
+    rng = random.Random(f'{seed}:{name}:{start}')
+    for i in range(start, stop):
+        yield factory(rng, i)
+
+
+def _insert_plan(model, conn):
+    """(INSERT statement, [(attname, prepare, missing value)]) for ``model``"""
+    fields = [field for field in model._meta.concrete_fields if not field.primary_key]
+    now = timezone.now()
+    columns = []
+    for field in fields:
+        # Fields the factories leave out get their default, prepared once
+        if getattr(field, 'auto_now', False) or getattr(field, 'auto_now_add', False):
+            missing = now.date() if isinstance(field, DateField) and not isinstance(field, DateTimeField) else now
+        else:
+            missing = field.get_default()
+        prepare = partial(field.get_db_prep_save, connection=conn)
+        columns.append((field.attname, prepare, prepare(missing)))
+    sql = 'INSERT INTO {} ({}) VALUES ({})'.format(
+        conn.ops.quote_name(model._meta.db_table),
+        ', '.join(conn.ops.quote_name(field.column) for field in fields),
+        ', '.join(['%s'] * len(fields)),
+    )
+    return sql, columns
+
+
+def insert_chunk(name, start, stop, seed, batch_size=DEFAULT_BATCH_SIZE):
+    """Insert one chunk of rows in batches; returns (name, rows inserted)"""
+    model, _factory = GENERATORS[name]
+    conn = connections[router.db_for_write(model)]
+    sql, columns = _insert_plan(model, conn)
+    rows = (
+        tuple(prepare(row[attname]) if attname in row else missing for attname, prepare, missing in columns)
+        for row in generate_rows(name, start, stop, seed)
+    )
+    with transaction.atomic(using=conn.alias), conn.cursor() as cursor:
+        while batch := list(itertools.islice(rows, batch_size)):
+            cursor.executemany(sql, batch)
+    return name, stop - start
+
+
+def plan_chunks(counts, chunk_size=DEFAULT_CHUNK_SIZE):
+    """Split {name: rows} into (name, start, stop) work items"""
+    for name, total in counts.items():
+        for start in range(0, total, chunk_size):
+            yield name, start, min(start + chunk_size, total)
+
+
+def default_workers():
+    # SQLite allows a single writer; parallel chunks would only fail on its lock
+    if connection.vendor == 'sqlite':
+        return 1
+    return os.cpu_count() or 1
+
+
+def _init_worker():
+    # Never share the parent's database sockets with a forked child
+    connections.close_all()
+
+
+def generate(counts, seed=0, workers=None, batch_size=DEFAULT_BATCH_SIZE, chunk_size=DEFAULT_CHUNK_SIZE, progress=None):
+    """
+    Insert ``counts`` ({name: rows}) synthetic rows and bump the content
+    version. ``progress`` is called with (name, rows) as chunks finish.
+    """
+    unknown = set(counts) - set(GENERATORS)
+    if unknown:
+        raise ValueError(f"Unknown content type(s): {', '.join(sorted(unknown))}")
+
+    workers = workers or default_workers()
+    if connection.vendor == 'sqlite' or 'fork' not in multiprocessing.get_all_start_methods():
+        # A single SQLite writer; spawned workers would have to set Django up again
+        workers = 1
+    chunks = list(plan_chunks(counts, chunk_size))
+    if workers <= 1 or len(chunks) <= 1:
+        for name, start, stop in chunks:
+            result = insert_chunk(name, start, stop, seed, batch_size)
+            if progress:
+                progress(*result)
+    else:
+        connections.close_all()
+        context = multiprocessing.get_context('fork')
+        with ProcessPoolExecutor(max_workers=workers, mp_context=context, initializer=_init_worker) as pool:
+            futures = [pool.submit(insert_chunk, name, start, stop, seed, batch_size) for name, start, stop in chunks]
+            for future in as_completed(futures):
+                result = future.result()
+                if progress:
+                    progress(*result)
+
+    return bump_content_version(*(GENERATORS[name][0] for name in counts))
+
+
+def clear(names):
+    """Empty the tables behind ``names`` without loading their rows"""
+    # QuerySet.delete() would fetch every row to send post_delete
+    tables = [GENERATORS[name][0]._meta.db_table for name in names]
+    connection.ops.execute_sql_flush(connection.ops.sql_flush(no_style(), tables, reset_sequences=True))
+    bump_content_version(*(GENERATORS[name][0] for name in names))
@@ -0,0 +1,143 @@
+"""
+Server-Sent Events channel announcing content version changes.
+
+Each process runs a single watcher task that follows the shared content
+version (see app/content.py) and fans changes out to every open stream, so
+idle connections cost one cache read per interval per process rather than
+one per connection. Saves made in the same process wake the watcher
+immediately; saves made by other workers are picked up on the next check.
+No broker is needed: the cache that already holds the version is the only
+shared state.
+"""
+import asyncio
+import contextvars
+import json
+import threading
+import time
+
+from django.conf import settings
+from django.core.handlers.asgi import ASGIRequest
+from django.http import HttpResponse, StreamingHttpResponse
+
+from .content import aget_content_version, format_etag
+
+# How often the watcher re-reads the shared version (seconds)
+SSE_CHECK_INTERVAL = getattr(settings, 'SSE_CHECK_INTERVAL', 2)
+# Comment line sent on idle streams so proxies keep them open (seconds)
+SSE_HEARTBEAT_INTERVAL = getattr(settings, 'SSE_HEARTBEAT_INTERVAL', 15)
+# Streams are closed after this long and the browser reconnects (seconds)
+SSE_MAX_DURATION = getattr(settings, 'SSE_MAX_DURATION', 300)
+# Reconnect delay handed to EventSource (milliseconds)
+SSE_RETRY_MS = getattr(settings, 'SSE_RETRY_MS', 5000)
+
+
+class VersionWatcher:
+    """Per-process fan-out of content version changes to subscribed streams"""
+
+    def __init__(self):
+        self._subscribers = set()
+        self._loop = None
+        self._task = None
+        self._wake = None
+        self._lock = threading.Lock()
+        self.version = None
+
+    def subscribe(self):
+        """Register a stream and return the queue it receives versions on"""
+        loop = asyncio.get_running_loop()
+        queue = asyncio.Queue(maxsize=1)
+        self._subscribers.add(queue)
+        if self._loop is not loop or self._task is None or self._task.done():
+            with self._lock:
+                self._loop = loop
+                self._wake = asyncio.Event()
+            # A fresh context, so the watcher is not tied to the request that
+            # happened to start it (asgiref binds sync_to_async calls to the
+            # request's thread-sensitive context)
+            self._task = loop.create_task(self._run(), context=contextvars.Context())
+        return queue
+
+    def unsubscribe(self, queue):
+        self._subscribers.discard(queue)
+
+    def notify(self):
+        """Wake the watcher now; safe to call from any thread"""
+        with self._lock:
+            loop, wake = self._loop, self._wake
+        if loop is not None and wake is not None and not loop.is_closed():
+            loop.call_soon_threadsafe(wake.set)
+
+    def _publish(self, version):
+        for queue in list(self._subscribers):
+            # Only the latest version matters to a slow reader
+            if queue.full():
+                queue.get_nowait()
+            queue.put_nowait(version)
+
+    async def _run(self):
+        while self._subscribers:
+            version = await aget_content_version()
+            if version != self.version:
+                self.version = version
+                self._publish(version)
+            try:
+                await asyncio.wait_for(self._wake.wait(), SSE_CHECK_INTERVAL)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+        self._task = None
+
+
+watcher = VersionWatcher()
+
+
+def notify_content_changed():
+    """Push the new content version to open streams in this process"""
+    watcher.notify()
+
+
+def _event(version):
+    data = json.dumps({'version': f'{version:x}', 'etag': format_etag(version)})
+    return f'event: version\nid: {version:x}\ndata: {data}\n\n'
+
+
+async def _stream(queue):
+    try:
+        yield f'retry: {SSE_RETRY_MS}\n\n'
+        # The current version goes out first so a client can tell whether it
+        # missed anything while it was disconnected
+        version = await aget_content_version()
+        yield _event(version)
+
+        deadline = time.monotonic() + SSE_MAX_DURATION
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                new_version = await asyncio.wait_for(
+                    queue.get(), min(SSE_HEARTBEAT_INTERVAL, remaining)
+                )
+            except asyncio.TimeoutError:
+                yield ': keep-alive\n\n'
+                continue
+            if new_version != version:
+                version = new_version
+                yield _event(version)
+    finally:
+        watcher.unsubscribe(queue)
+
+
+async def content_events(request):
+    """Server-Sent Events stream of content version changes"""
+    if not isinstance(request, ASGIRequest):
+        # A WSGI worker would be tied up for the whole stream. 204 tells
+        # EventSource not to reconnect, and theme-manager.js then sticks to
+        # polling (see RAILWAY_DEPLOYMENT.md: push needs ASGI mode).
+        return HttpResponse(status=204)
+
+    response = StreamingHttpResponse(_stream(watcher.subscribe()), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    # Stop nginx-style proxies from buffering the stream
+    response['X-Accel-Buffering'] = 'no'
+    return response
@@ -0,0 +1,191 @@
+"""
+Static export of the public site.
+
+The home page and the theme API depend on nothing but database content, so
+they can be rendered once per content version and served as files. An export
+lives in EXPORT_ROOT:
+
+    files/index.<hash>.html(.gz|.br)   content-addressed artifacts
+    files/theme.<hash>.json(.gz|.br)
+    manifest.json                      {"version", "routes": {url: file}}
+
+Artifacts are named after a hash of their content, so re-exporting only
+writes (and compresses) what actually changed, and a file is never modified
+once a manifest points to it. Publishing a new export is a single
+``os.replace()`` of manifest.json, which is atomic.
+
+ExportedSiteMiddleware (app/middleware.py) answers the exported URLs from
+these files through WhiteNoise while the manifest's version is still the
+current content version, and falls back to the normal views otherwise. With
+EXPORT_SITE_ON_SAVE, a content change triggers a re-export in the background.
+Every worker may ask for it, so a version is exported by whichever worker
+first takes its lock in the shared cache; the others leave it be.
+"""
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from pathlib import Path
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection
+from django.test import RequestFactory
+from whitenoise.compress import Compressor
+
+from .content import build_snapshot, get_content_version
+from .pagecache import MEDIA_URL_MAX_AGE
+
+logger = logging.getLogger(__name__)
+
+EXPORT_ROOT = Path(getattr(settings, 'EXPORT_ROOT', Path(settings.BASE_DIR) / 'export'))
+# URL prefix the hashed artifacts are also served under, with immutable caching
+EXPORT_URL = getattr(settings, 'EXPORT_URL', '/_export/')
+# Artifacts no manifest refers to are deleted once they are this old (seconds)
+EXPORT_KEEP = getattr(settings, 'EXPORT_KEEP', 60 * 60)
+# How long one worker owns the export of a version; a failed export is
+# retried after this (seconds)
+EXPORT_LOCK_TIMEOUT = getattr(settings, 'EXPORT_LOCK_TIMEOUT', 60)
+
+# Exported URL -> artifact name stem and extension
+ROUTES = {
+    '/': ('index', '.html'),
+    '/api/theme/': ('theme', '.json'),
+}
+
+MANIFEST_NAME = 'manifest.json'
+
+
+def manifest_path(root=EXPORT_ROOT):
+    return Path(root) / MANIFEST_NAME
+
+
+def read_manifest(root=EXPORT_ROOT):
+    try:
+        return json.loads(manifest_path(root).read_text())
+    except (OSError, ValueError):
+        return None
+
+
+def render_route(url, snapshot):
+    """Render ``url`` from ``snapshot``, as an anonymous GET would"""
+    # Not through the views: the page cache may answer with the previous
+    # version's page while another worker re-renders
+    from .views import render_home, render_theme
+
+    request = RequestFactory().get(url)
+    if url == '/':
+        return render_home(request, snapshot)['content']
+    response = render_theme(snapshot)
+    if response.status_code != 200:
+        raise RuntimeError(f'{url} answered {response.status_code}')
+    return response.content
+
+
+def _write_atomic(path, data):
+    tmp = path.with_name(f'.{path.name}.{os.getpid()}.{threading.get_ident()}.tmp')
+    tmp.write_bytes(data)
+    os.replace(tmp, path)
+
+
+def export_site(root=EXPORT_ROOT, compress=True):
+    """
+    Render every exported route and publish a new manifest.
+
+    Returns a summary dict: the exported ``version`` and the artifact names
+    that were ``written`` and ``reused``.
+    """
+    if MEDIA_URL_MAX_AGE:
+        raise RuntimeError('The static export would serve presigned media URLs after they expire; '
+                           'use unsigned media URLs (AWS_QUERYSTRING_AUTH=False) to export')
+    root = Path(root)
+    files = root / 'files'
+    files.mkdir(parents=True, exist_ok=True)
+    compressor = Compressor(quiet=True)
+
+    # A fresh snapshot reads the version before the content: if content
+    # changes meanwhile, the manifest is labelled stale and the middleware
+    # keeps using the views
+    snapshot = build_snapshot()
+    version = snapshot.version
+    routes, written, reused = {}, [], []
+    for url, (stem, extension) in ROUTES.items():
+        content = render_route(url, snapshot)
+        name = f'{stem}.{hashlib.sha256(content).hexdigest()[:16]}{extension}'
+        path = files / name
+        if path.exists():
+            reused.append(name)
+        else:
+            _write_atomic(path, content)
+            if compress:
+                compressor.compress(str(path))
+            written.append(name)
+        routes[url] = name
+
+    manifest = {'version': version, 'created': time.time(), 'routes': routes}
+    _write_atomic(manifest_path(root), json.dumps(manifest, indent=2).encode())
+
+    prune(root, keep=set(routes.values()))
+    return {'version': version, 'written': written, 'reused': reused}
+
+
+def prune(root=EXPORT_ROOT, keep=(), max_age=EXPORT_KEEP):
+    """Delete artifacts outside ``keep`` once they are older than ``max_age``"""
+    # The grace period lets responses already streaming an old file finish
+    cutoff = time.time() - max_age
+    for path in (Path(root) / 'files').iterdir():
+        base = path.name.removesuffix('.gz').removesuffix('.br')
+        if base not in keep and path.stat().st_mtime < cutoff:
+            path.unlink(missing_ok=True)
+
+
+class ExportScheduler:
+    """Runs export_site() in a background thread, coalescing bursts of saves"""
+
+    def __init__(self, delay=1.0):
+        self.delay = delay
+        self._lock = threading.Lock()
+        self._pending = False
+        self._thread = None
+
+    def schedule(self):
+        with self._lock:
+            self._pending = True
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='export-site', daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        try:
+            while True:
+                # Let an admin action that saves several objects finish first
+                time.sleep(self.delay)
+                with self._lock:
+                    if not self._pending:
+                        self._thread = None
+                        return
+                    self._pending = False
+                version = get_content_version()
+                manifest = read_manifest()
+                if manifest and manifest['version'] == version:
+                    continue
+                if not cache.add(f'export:lock:{version}', os.getpid(), timeout=EXPORT_LOCK_TIMEOUT):
+                    # Another worker is exporting this version (or just did)
+                    continue
+                try:
+                    export_site()
+                except Exception:
+                    logger.exception('Site export failed')
+        finally:
+            connection.close()
+
+
+scheduler = ExportScheduler()
+
+
+def schedule_export():
+    """Re-export the site after a content change, if EXPORT_SITE_ON_SAVE is set"""
+    if getattr(settings, 'EXPORT_SITE_ON_SAVE', False) and not MEDIA_URL_MAX_AGE:
+        scheduler.schedule()
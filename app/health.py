@@ -0,0 +1,192 @@
+"""
+Liveness and readiness probes.
+
+``/health/live/`` only says the worker is up and answering: it never
+touches the database. ``/health/ready/`` (and the legacy ``/health/`` that
+Railway probes) reports the last database probe, so however often the
+probes come, each worker runs at most one ``SELECT 1`` per
+HEALTH_PROBE_TTL: a stale result is answered at once and refreshed by a
+background thread (stale-while-revalidate). A request waits for the probe
+only when there is no usable result: the worker's first readiness request,
+and any that comes after HEALTH_PROBE_MAX_AGE without one (the result is
+then too old to vouch for the database).
+
+HealthProbeMiddleware answers these paths first in MIDDLEWARE, before
+sessions, CSRF and request logging run; the same views are in urls.py so
+they also work without it.
+"""
+import os
+import threading
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.db import connection
+from django.http import JsonResponse
+from django.utils import timezone
+
+# How long a database probe result is reused (seconds)
+HEALTH_PROBE_TTL = getattr(settings, 'HEALTH_PROBE_TTL', 5)
+# Past this age a result is refreshed before answering; if the refresh does
+# not finish in time either, the refresher is stuck and readiness fails (seconds)
+HEALTH_PROBE_MAX_AGE = getattr(settings, 'HEALTH_PROBE_MAX_AGE', HEALTH_PROBE_TTL * 6)
+
+LIVE_PATHS = ('/health/live/', '/health/live')
+READY_PATHS = ('/health/ready/', '/health/ready', '/health/', '/health')
+
+
+class DatabaseProbe:
+    """
+    Runs ``SELECT 1`` on a thread of its own (one per worker), which keeps
+    its connection open between probes, and on demand only: nothing is
+    queried while nobody asks.
+    """
+
+    def __init__(self, ttl=HEALTH_PROBE_TTL):
+        self.ttl = ttl
+        self.result = None
+        self._lock = threading.Lock()
+        self._wanted = threading.Event()
+        self._checked = threading.Condition()
+        self._pid = None
+
+    def _probe(self):
+        start = time.perf_counter()
+        try:
+            with connection.cursor() as cursor:
+                cursor.execute('SELECT 1')
+            return None, time.perf_counter() - start
+        except Exception as e:
+            # Drop the broken connection so the next attempt reconnects
+            connection.close()
+            return str(e), time.perf_counter() - start
+
+    def check(self):
+        """Run one probe in the calling thread and store its result"""
+        checked_at = timezone.now().isoformat()
+        error, latency = self._probe()
+        if error is not None:
+            # The kept connection may just have gone stale (database restart)
+            error, latency = self._probe()
+        result = {
+            'ok': error is None,
+            'checked': time.monotonic(),
+            'checked_at': checked_at,
+            'latency_ms': round(latency * 1000, 2),
+        }
+        if error is not None:
+            result['error'] = error
+
+        pool = getattr(connection, 'pool', None)
+        if pool is not None:
+            result['pool'] = pool.get_stats()
+            # Don't hold a pooled connection between probes
+            connection.close()
+        with self._checked:
+            self.result = result
+            self._checked.notify_all()
+        return result
+
+    def _run(self):
+        while True:
+            self._wanted.wait()
+            self._wanted.clear()
+            self.check()
+
+    def _ensure_thread(self):
+        # Threads don't survive a fork: start one per worker
+        if self._pid != os.getpid():
+            with self._lock:
+                if self._pid != os.getpid():
+                    self.result = None
+                    threading.Thread(target=self._run, name='health-probe', daemon=True).start()
+                    self._pid = os.getpid()
+
+    def pending(self):
+        """Whether get() would have to wait for a probe in this worker"""
+        result = self.result
+        return result is None or self._pid != os.getpid() or self._expired(result)
+
+    def _expired(self, result):
+        return time.monotonic() - result['checked'] > HEALTH_PROBE_MAX_AGE
+
+    def get(self, timeout=HEALTH_PROBE_MAX_AGE):
+        """Latest result, refreshed in the background once older than the TTL"""
+        self._ensure_thread()
+        result = self.result
+        if result is None or self._expired(result):
+            # The worker's first probe, or the last one is too old to go by
+            # (nobody asked for a while): wait for a fresh one
+            self._wanted.set()
+            with self._checked:
+                self._checked.wait_for(lambda: self.result is not result, timeout)
+            return self.result
+        if time.monotonic() - result['checked'] > self.ttl:
+            self._wanted.set()
+        return result
+
+
+database_probe = DatabaseProbe()
+
+
+def liveness(request):
+    return JsonResponse({'status': 'alive'}, headers={'Cache-Control': 'no-store'})
+
+
+def readiness(request):
+    result = database_probe.get()
+    if result is None:
+        return JsonResponse(
+            {'status': 'unhealthy', 'database': 'unknown', 'error': 'database probe timed out', 'timestamp': str(timezone.now())},
+            status=503,
+            headers={'Cache-Control': 'no-store'},
+        )
+    age = time.monotonic() - result['checked']
+    ready = result['ok'] and age <= HEALTH_PROBE_MAX_AGE
+    data = {
+        'status': 'healthy' if ready else 'unhealthy',
+        'database': 'connected' if result['ok'] else 'unavailable',
+        'latency_ms': result['latency_ms'],
+        'checked_at': result['checked_at'],
+        'age_s': round(age, 2),
+        'conn_max_age': connection.settings_dict['CONN_MAX_AGE'],
+        'timestamp': str(timezone.now()),
+    }
+    if 'error' in result:
+        data['error'] = result['error']
+    elif not ready:
+        data['error'] = 'database probe is out of date'
+    if 'pool' in result:
+        data['pool'] = result['pool']
+    return JsonResponse(data, status=200 if ready else 503, headers={'Cache-Control': 'no-store'})
+
+
+class HealthProbeMiddleware:
+    """Answers the probe paths before the rest of the middleware stack (keep first)"""
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        if request.path in LIVE_PATHS:
+            return liveness(request)
+        if request.path in READY_PATHS:
+            return readiness(request)
+        return self.get_response(request)
+
+    async def __acall__(self, request):
+        if request.path in LIVE_PATHS:
+            return liveness(request)
+        if request.path in READY_PATHS:
+            if database_probe.pending():
+                # The worker's first probe blocks: wait for it off the event loop
+                return await sync_to_async(readiness, thread_sensitive=False)(request)
+            return readiness(request)
+        return await self.get_response(request)
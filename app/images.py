@@ -0,0 +1,361 @@
+"""
+Resized, re-encoded derivatives of uploaded images.
+
+For every uploaded image we write a few narrower copies as WebP (and AVIF
+when this Pillow can encode it), without EXIF/XMP metadata, next to a small
+JSON manifest listing them:
+
+    derivatives/<upload name>.json
+    derivatives/<upload dir>/<stem>.<digest>.<width>w.<format>
+
+Derivative names carry a digest of the source file, so they never change
+once written and can be cached forever. Generation runs on a thread pool
+(Pillow releases the GIL while decoding, resizing and encoding) and is
+triggered after an upload is committed (see app/signals.py); the
+``build_image_derivatives`` command backfills existing uploads.
+
+The same job computes a ~16px WebP placeholder, stored as a data URI in the
+model's ``image_placeholders`` (keyed by field, with the file name it was
+made from) so it can be inlined into the page while the real image loads.
+
+Each scheduled job is recorded as a small JSON marker under
+derivatives/pending/ until it succeeds, and failing jobs are retried a few
+times. Jobs lost to a restart, or still failing after their retries, are
+picked up again when a worker starts (app/warmup.py; one worker per
+IMAGE_JOB_RESUME_INTERVAL) or by ``build_image_derivatives --pending``.
+Not in the release phase: the media volume is not mounted there.
+
+The ``media_tags`` template library turns a manifest into srcset/sizes.
+"""
+import base64
+import hashlib
+import io
+import json
+import logging
+import os
+import posixpath
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.apps import apps
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import FieldError
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import connection
+from PIL import Image, ImageOps
+
+from .content import bump_content_version, snapshot_version
+from .storage import exists_many
+
+logger = logging.getLogger(__name__)
+
+IMAGE_DERIVATIVE_WIDTHS = getattr(settings, 'IMAGE_DERIVATIVE_WIDTHS', (320, 640, 960, 1280, 1920))
+IMAGE_DERIVATIVE_QUALITY = getattr(settings, 'IMAGE_DERIVATIVE_QUALITY', {'webp': 80, 'avif': 55})
+IMAGE_DERIVATIVE_WORKERS = getattr(settings, 'IMAGE_DERIVATIVE_WORKERS', 2)
+IMAGE_PLACEHOLDER_WIDTH = getattr(settings, 'IMAGE_PLACEHOLDER_WIDTH', 16)
+# Tries per job, and seconds before the first retry (doubled after each)
+IMAGE_JOB_ATTEMPTS = getattr(settings, 'IMAGE_JOB_ATTEMPTS', 3)
+IMAGE_JOB_RETRY_DELAY = getattr(settings, 'IMAGE_JOB_RETRY_DELAY', 2)
+# Least time between two resumes of the recorded jobs, across workers (seconds)
+IMAGE_JOB_RESUME_INTERVAL = getattr(settings, 'IMAGE_JOB_RESUME_INTERVAL', 10 * 60)
+# Seconds a missing manifest is remembered before storage is asked again
+IMAGE_MANIFEST_MISS_TIMEOUT = getattr(settings, 'IMAGE_MANIFEST_MISS_TIMEOUT', 60)
+DERIVATIVES_DIR = 'derivatives'
+PENDING_DIR = posixpath.join(DERIVATIVES_DIR, 'pending')
+
+# Pillow name for each output format, best compression first
+FORMATS = {'avif': 'AVIF', 'webp': 'WEBP'}
+MIME_TYPES = {'avif': 'image/avif', 'webp': 'image/webp'}
+
+# ImageFields that get derivatives, per model
+IMAGE_FIELDS = {
+    'Project': ('image',),
+    'Testimonial': ('image',),
+    'SiteSettings': ('profile_image', 'about_image', 'home_background_image', 'meta_image'),
+}
+
+_manifests = {}
+# name -> (snapshot version, expires at) of manifests found missing
+_missing_manifests = {}
+_manifests_lock = threading.Lock()
+_executor = None
+_executor_lock = threading.Lock()
+_placeholders_lock = threading.Lock()
+
+
+def available_formats():
+    """Output formats this Pillow build can encode"""
+    Image.init()
+    return [fmt for fmt, pillow_name in FORMATS.items() if pillow_name in Image.SAVE]
+
+
+def manifest_name(name):
+    return posixpath.join(DERIVATIVES_DIR, f'{name}.json')
+
+
+def variant_name(name, digest, width, fmt):
+    stem, _ext = posixpath.splitext(name)
+    return posixpath.join(DERIVATIVES_DIR, f'{stem}.{digest}.{width}w.{fmt}')
+
+
+def _encode(image, fmt, icc_profile=None):
+    buffer = io.BytesIO()
+    options = {'quality': IMAGE_DERIVATIVE_QUALITY.get(fmt, 75)}
+    if fmt == 'webp':
+        options['method'] = 6
+    # The colour profile is kept; EXIF/XMP are dropped by not passing them on
+    if icc_profile:
+        options['icc_profile'] = icc_profile
+    image.save(buffer, FORMATS[fmt], **options)
+    return buffer.getvalue()
+
+
+def _load(data):
+    """Decode an upload into an upright RGB(A) image and its colour profile"""
+    with Image.open(io.BytesIO(data)) as original:
+        original.load()
+        icc_profile = original.info.get('icc_profile')
+        # Apply the EXIF orientation before the EXIF block is dropped
+        image = ImageOps.exif_transpose(original)
+    if image.mode not in ('RGB', 'RGBA'):
+        if image.mode == 'CMYK':
+            # The embedded profile describes the CMYK data, not the converted pixels
+            icc_profile = None
+        image = image.convert('RGBA' if 'transparency' in image.info or image.mode in ('LA', 'PA') else 'RGB')
+    return image, icc_profile
+
+
+def make_placeholder(image):
+    """A tiny WebP of ``image`` as a data: URI (a few hundred bytes)"""
+    width = min(IMAGE_PLACEHOLDER_WIDTH, image.width)
+    height = max(1, round(image.height * width / image.width))
+    buffer = io.BytesIO()
+    image.resize((width, height), Image.Resampling.BOX).save(buffer, 'WEBP', quality=30)
+    return 'data:image/webp;base64,' + base64.b64encode(buffer.getvalue()).decode('ascii')
+
+
+def build_derivatives(name, storage=default_storage, widths=IMAGE_DERIVATIVE_WIDTHS):
+    """Write the derivatives and manifest for the stored image ``name``; returns the manifest"""
+    with storage.open(name, 'rb') as source:
+        data = source.read()
+    digest = hashlib.sha256(data).hexdigest()[:10]
+    image, icc_profile = _load(data)
+
+    # Never upscale; always include one copy at the original width (capped)
+    targets = sorted({w for w in widths if w < image.width} | {min(image.width, max(widths))})
+    manifest = {'source': name, 'width': image.width, 'height': image.height, 'variants': {}}
+    formats = available_formats()
+    existing = exists_many(storage, [variant_name(name, digest, w, fmt) for fmt in formats for w in targets])
+    for fmt in formats:
+        variants = []
+        for width in targets:
+            target = variant_name(name, digest, width, fmt)
+            if target not in existing:
+                height = round(image.height * width / image.width)
+                resized = image.resize((width, height), Image.Resampling.LANCZOS) if width != image.width else image
+                storage.save(target, ContentFile(_encode(resized, fmt, icc_profile)))
+            variants.append([width, target])
+        manifest['variants'][fmt] = variants
+    manifest['placeholder'] = make_placeholder(image)
+
+    # Rewrite rather than let the storage pick an alternative name
+    target = manifest_name(name)
+    if storage.exists(target):
+        storage.delete(target)
+    storage.save(target, ContentFile(json.dumps(manifest, separators=(',', ':')).encode()))
+    with _manifests_lock:
+        _manifests[name] = manifest
+        _missing_manifests.pop(name, None)
+    return manifest
+
+
+def get_manifest(name, storage=default_storage):
+    """Return the derivative manifest for the stored image ``name``, or None"""
+    manifest = _manifests.get(name)
+    if manifest is not None:
+        return manifest
+    # A miss holds until it times out or the content version moves, which
+    # the job does once the manifest is written (in whichever process)
+    version = snapshot_version()
+    missing = _missing_manifests.get(name)
+    if missing is not None and missing[0] == version and missing[1] > time.monotonic():
+        return None
+    try:
+        with storage.open(manifest_name(name), 'rb') as f:
+            manifest = json.loads(f.read())
+    except (OSError, ValueError):
+        # Not generated (yet)
+        with _manifests_lock:
+            _missing_manifests[name] = (version, time.monotonic() + IMAGE_MANIFEST_MISS_TIMEOUT)
+        return None
+    with _manifests_lock:
+        _manifests[name] = manifest
+        _missing_manifests.pop(name, None)
+    return manifest
+
+
+def job_name(model, pk, field):
+    return posixpath.join(PENDING_DIR, f'{model._meta.label_lower}.{pk}.{field}.json')
+
+
+def _read_job(marker, storage=default_storage):
+    try:
+        with storage.open(marker, 'rb') as f:
+            return json.loads(f.read())
+    except (OSError, ValueError):
+        return None
+
+
+def record_job(model, pk, field, name, failures=0, error=None, storage=default_storage):
+    """Write the pending marker of one image job"""
+    marker = job_name(model, pk, field)
+    job = {'model': model._meta.label_lower, 'pk': pk, 'field': field, 'name': name, 'failures': failures}
+    if error:
+        job['error'] = error
+    if storage.exists(marker):
+        storage.delete(marker)
+    storage.save(marker, ContentFile(json.dumps(job).encode()))
+
+
+def finish_job(model, pk, field, name, error=None, storage=default_storage):
+    """Drop the marker of a job that succeeded, or count the failure of one that didn't"""
+    marker = job_name(model, pk, field)
+    try:
+        job = _read_job(marker, storage)
+        if job is not None and job['name'] != name:
+            # The field was uploaded again meanwhile; that job owns the marker now
+            return
+        if error is None:
+            if job is not None:
+                storage.delete(marker)
+        else:
+            record_job(model, pk, field, name, (job or {}).get('failures', 0) + 1, error, storage)
+    except Exception:
+        logger.exception('Could not update the pending marker of image %s', name)
+
+
+def pending_jobs(storage=default_storage):
+    """Recorded jobs that have not succeeded yet, as [(model, pk, field, name, failures)]"""
+    try:
+        _dirs, files = storage.listdir(PENDING_DIR)
+    except (OSError, ValueError):
+        return []
+    jobs = []
+    for filename in sorted(files):
+        marker = posixpath.join(PENDING_DIR, filename)
+        job = _read_job(marker, storage)
+        current = None
+        if job is not None:
+            try:
+                model = apps.get_model(job['model'])
+                current = model.objects.filter(pk=job['pk']).values_list(job['field'], flat=True).first()
+            except (KeyError, LookupError, FieldError):
+                pass
+        if job is None or current != job['name']:
+            # Unreadable, or the row or its upload is gone: nothing left to do
+            storage.delete(marker)
+            continue
+        jobs.append((model, job['pk'], job['field'], job['name'], job.get('failures', 0)))
+    return jobs
+
+
+def store_placeholder(model, pk, field, name, placeholder):
+    """Record ``placeholder`` for ``field`` on one row, without sending signals"""
+    # Several fields of the same row may finish at once: read-modify-write
+    # under a lock so they don't overwrite each other's entries
+    with _placeholders_lock:
+        current = model.objects.filter(pk=pk).values_list('image_placeholders', flat=True).first()
+        if current is None:
+            return
+        current[field] = {'name': name, 'data': placeholder}
+        model.objects.filter(pk=pk).update(image_placeholders=current)
+
+
+def process_upload(model, pk, field, name, force=False):
+    """Background job for one uploaded image: derivatives, then placeholder"""
+    try:
+        for attempt in range(IMAGE_JOB_ATTEMPTS):
+            try:
+                manifest = None if force else get_manifest(name)
+                if manifest is None or 'placeholder' not in manifest:
+                    manifest = build_derivatives(name)
+                store_placeholder(model, pk, field, name, manifest['placeholder'])
+                break
+            except Exception as e:
+                if attempt + 1 < IMAGE_JOB_ATTEMPTS:
+                    logger.warning('Could not process uploaded image %s (%s), retrying', name, e)
+                    time.sleep(IMAGE_JOB_RETRY_DELAY * 2 ** attempt)
+                    continue
+                logger.exception('Could not process uploaded image %s', name)
+                finish_job(model, pk, field, name, error=repr(e))
+                return None
+        finish_job(model, pk, field, name)
+    finally:
+        connection.close()
+    # Pages rendered before this reference the original without a placeholder
+    bump_content_version(model)
+    return manifest
+
+
+def _get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=IMAGE_DERIVATIVE_WORKERS, thread_name_prefix='image-derivatives')
+        return _executor
+
+
+def schedule_uploads(instance, fields):
+    """Process ``instance``'s images in ``fields`` in the background; returns the futures"""
+    executor = _get_executor()
+    model = type(instance)
+    futures = []
+    for field in fields:
+        name = getattr(instance, field).name
+        try:
+            record_job(model, instance.pk, field, name)
+        except Exception:
+            # Still worth trying; only a restart before it finishes would lose it
+            logger.exception('Could not record the pending job of image %s', name)
+        futures.append(executor.submit(process_upload, model, instance.pk, field, name))
+    return futures
+
+
+def _resume_jobs():
+    try:
+        jobs = pending_jobs()
+    except Exception:
+        logger.exception('Could not list the pending image jobs')
+        return
+    finally:
+        connection.close()
+    executor = _get_executor()
+    for model, pk, field, name, _failures in jobs:
+        executor.submit(process_upload, model, pk, field, name)
+    if jobs:
+        logger.info('Resumed %s pending image job(s)', len(jobs))
+
+
+def resume_pending_jobs():
+    """Rerun the recorded jobs in the background, unless a worker did lately; returns whether it will"""
+    # Every worker calls this on start; the first one to take the lock does it
+    if not cache.add('images:resume', os.getpid(), timeout=IMAGE_JOB_RESUME_INTERVAL):
+        return False
+    _get_executor().submit(_resume_jobs)
+    return True
+
+
+def pending_images(instance):
+    """Image fields of ``instance`` with an upload that has not been processed yet"""
+    placeholders = getattr(instance, 'image_placeholders', None) or {}
+    fields = []
+    for field in IMAGE_FIELDS.get(type(instance).__name__, ()):
+        file = getattr(instance, field)
+        if not file or not file.name:
+            continue
+        if placeholders.get(field, {}).get('name') != file.name or get_manifest(file.name) is None:
+            fields.append(field)
+    return fields
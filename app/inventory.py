@@ -0,0 +1,154 @@
+"""
+File inventory of STATIC_ROOT / MEDIA_ROOT: file counts, bytes, per-directory
+totals and a few sample names, answered from memory.
+
+The first request in a worker scans the tree once. After that, a refresh
+stats every known directory and rescans only those whose mtime changed,
+which costs O(directories) stat calls instead of O(files). A directory's
+mtime changes whenever a file is created, deleted or renamed in it. That
+covers uploads, storage saves and upload_media, which write to a temporary
+name and rename it. A file rewritten in place keeps its old size here until
+its directory changes.
+
+Refreshes happen in the background once the summary is older than
+INVENTORY_REFRESH_INTERVAL, so readers never wait after the first scan.
+Each worker keeps its own inventory.
+"""
+import os
+import threading
+import time
+from collections import namedtuple
+
+from django.conf import settings
+from django.utils import timezone
+
+# How old a summary may get before a background rescan (seconds)
+INVENTORY_REFRESH_INTERVAL = getattr(settings, 'INVENTORY_REFRESH_INTERVAL', 30)
+INVENTORY_SAMPLE_SIZE = 5
+
+# Contents of one directory (not including subdirectories)
+Directory = namedtuple('Directory', 'mtime_ns files bytes subdirs sample')
+
+
+class Inventory:
+    def __init__(self, root, interval=INVENTORY_REFRESH_INTERVAL):
+        self.root = str(root)
+        self.interval = interval
+        self._dirs = {}
+        self._summary = None
+        self._checked = 0.0
+        self._lock = threading.Lock()
+        self._refreshing = False
+        self._pid = os.getpid()
+
+    def _scan_dir(self, rel, mtime_ns):
+        files = size = 0
+        subdirs, names = [], []
+        with os.scandir(os.path.join(self.root, rel)) as entries:
+            for entry in entries:
+                try:
+                    if entry.is_dir(follow_symlinks=False):
+                        subdirs.append(os.path.join(rel, entry.name))
+                    elif entry.is_file():
+                        files += 1
+                        size += entry.stat().st_size
+                        names.append(entry.name)
+                except OSError:
+                    # Removed while scanning: the next refresh sees the new mtime
+                    continue
+        sample = tuple(os.path.join(rel, name) for name in sorted(names)[:INVENTORY_SAMPLE_SIZE])
+        return Directory(mtime_ns, files, size, tuple(sorted(subdirs)), sample)
+
+    def refresh(self):
+        """Rescan changed directories; returns how many were rescanned"""
+        with self._lock:
+            start = time.perf_counter()
+            rescanned = 0
+            seen = set()
+            stack = ['']
+            while stack:
+                rel = stack.pop()
+                try:
+                    # Read before scanning, so a change during the scan is caught next time
+                    mtime_ns = os.stat(os.path.join(self.root, rel)).st_mtime_ns
+                    directory = self._dirs.get(rel)
+                    if directory is None or directory.mtime_ns != mtime_ns:
+                        directory = self._dirs[rel] = self._scan_dir(rel, mtime_ns)
+                        rescanned += 1
+                except OSError:
+                    continue
+                seen.add(rel)
+                stack.extend(directory.subdirs)
+
+            removed = self._dirs.keys() - seen
+            for rel in removed:
+                del self._dirs[rel]
+            if rescanned or removed or self._summary is None:
+                self._summary = self._summarize()
+            self._summary['checked_at'] = timezone.now().isoformat()
+            self._summary['refresh_ms'] = round((time.perf_counter() - start) * 1000, 2)
+            self._summary['rescanned_directories'] = rescanned
+            self._checked = time.monotonic()
+            return rescanned
+
+    def _summarize(self):
+        files = size = 0
+        # Totals per top-level directory ('.' for files directly in the root)
+        top = {}
+        for rel, directory in self._dirs.items():
+            files += directory.files
+            size += directory.bytes
+            name = rel.split(os.sep, 1)[0] if rel else '.'
+            stats = top.setdefault(name, {'files': 0, 'bytes': 0, 'directories': 0})
+            stats['files'] += directory.files
+            stats['bytes'] += directory.bytes
+            stats['directories'] += 1
+
+        sample = []
+        for rel in sorted(self._dirs):
+            sample.extend(self._dirs[rel].sample[:INVENTORY_SAMPLE_SIZE - len(sample)])
+            if len(sample) >= INVENTORY_SAMPLE_SIZE:
+                break
+
+        return {
+            'root': self.root,
+            'exists': '' in self._dirs,
+            'files': files,
+            'bytes': size,
+            'directories': len(self._dirs),
+            'by_directory': dict(sorted(top.items())),
+            'sample_files': sample,
+        }
+
+    def _background_refresh(self):
+        try:
+            self.refresh()
+        finally:
+            self._refreshing = False
+
+    def summary(self):
+        """The latest summary (a copy); scans synchronously only the first time"""
+        if self._pid != os.getpid():
+            # Forked: a refresh that was running in the parent is not running here
+            self._pid = os.getpid()
+            self._refreshing = False
+        if self._summary is None:
+            self.refresh()
+        elif time.monotonic() - self._checked > self.interval and not self._refreshing:
+            self._refreshing = True
+            threading.Thread(target=self._background_refresh, name='inventory', daemon=True).start()
+        return dict(self._summary)
+
+
+_inventories = {}
+_inventories_lock = threading.Lock()
+
+
+def get_inventory(root):
+    """The shared Inventory for ``root`` in this process"""
+    root = str(root)
+    inventory = _inventories.get(root)
+    if inventory is None:
+        with _inventories_lock:
+            inventory = _inventories.setdefault(root, Inventory(root))
+    return inventory
@@ -0,0 +1,435 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.conf import settings
+from django.db import connection
+from django.db.backends.signals import connection_created
+from django.test import Client, override_settings
+from django.test.utils import CaptureQueriesContext, setup_test_environment, teardown_test_environment
+from app.datagen import GENERATORS, generate
+from pathlib import Path
+from urllib.parse import quote
+from urllib.request import urlopen
+from urllib.error import HTTPError
+from concurrent.futures import ThreadPoolExecutor
+import json
+import logging
+import os
+import re
+import resource
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+
+
+DEFAULT_BASELINE = Path(settings.BASE_DIR) / 'benchmarks' / 'baseline.json'
+DEFAULT_ENDPOINTS = ['/', '/api/theme/', '/health/']
+
+
+def percentile(values, pct):
+    """Nearest-rank percentile of an already sorted list"""
+    if not values:
+        return None
+    index = max(0, min(len(values) - 1, round(pct / 100 * len(values) + 0.5) - 1))
+    return values[index]
+
+
+def summarize(latencies, elapsed, queries, sizes, statuses, connections):
+    latencies = sorted(latencies)
+    return {
+        'requests': len(latencies),
+        'throughput_rps': round(len(latencies) / elapsed, 1) if elapsed else None,
+        'p50_ms': round(percentile(latencies, 50) * 1000, 2),
+        'p95_ms': round(percentile(latencies, 95) * 1000, 2),
+        'p99_ms': round(percentile(latencies, 99) * 1000, 2),
+        'queries_per_request': round(sum(queries) / len(queries), 2) if queries else None,
+        'connections_per_request': round(sum(connections) / len(connections), 2) if connections else None,
+        'bytes_per_response': round(sum(sizes) / len(sizes)) if sizes else None,
+        'statuses': {str(code): statuses.count(code) for code in sorted(set(statuses))},
+    }
+
+
+def database_url(settings_dict):
+    """DATABASE_URL a subprocess can use to reach the benchmark database"""
+    engine = settings_dict['ENGINE']
+    if 'sqlite3' in engine:
+        return f"sqlite:///{settings_dict['NAME']}"
+    if 'postgresql' in engine:
+        user = quote(settings_dict.get('USER') or '')
+        password = quote(settings_dict.get('PASSWORD') or '')
+        auth = f'{user}:{password}@' if password else (f'{user}@' if user else '')
+        host = settings_dict.get('HOST') or 'localhost'
+        port = settings_dict.get('PORT') or 5432
+        return f"postgres://{auth}{host}:{port}/{settings_dict['NAME']}"
+    raise CommandError(f'Unsupported database engine for the server modes: {engine}')
+
+
+def process_tree_hwm(pid):
+    """Sum of peak RSS (VmHWM, kB) of a process and its descendants, from /proc"""
+    total = 0
+    try:
+        with open(f'/proc/{pid}/status') as status:
+            for line in status:
+                if line.startswith('VmHWM:'):
+                    total += int(line.split()[1])
+        with open(f'/proc/{pid}/task/{pid}/children') as children:
+            child_pids = children.read().split()
+    except OSError:
+        return total
+    return total + sum(process_tree_hwm(int(child)) for child in child_pids)
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+class Command(BaseCommand):
+    help = 'Benchmark the public endpoints against seeded databases and compare with a baseline'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', default='10', help='Comma separated rows per content model (default: 10)')
+        parser.add_argument('--seed', type=int, default=0, help='Seed for the generated content (default: 0)')
+        parser.add_argument('--mode', choices=['inprocess', 'gunicorn', 'uvicorn', 'both', 'servers', 'render'], default='inprocess', help='Drive the app through the Django test client, a local gunicorn (WSGI, sync views), a local uvicorn (ASGI, async views), both inprocess and gunicorn, or both servers; render times the cached sections of index.html without any cache, to check they grow linearly with --sizes')
+        parser.add_argument('--requests', type=int, default=200, help='Measured requests per endpoint (default: 200)')
+        parser.add_argument('--warmup', type=int, default=5, help='Unmeasured requests per endpoint first (default: 5)')
+        parser.add_argument('--concurrency', type=int, default=4, help='Concurrent clients in the server modes (default: 4)')
+        parser.add_argument('--workers', type=int, default=2, help='Server worker processes (default: 2)')
+        parser.add_argument('--conn-max-age', type=int, help='Override CONN_MAX_AGE (DB_CONN_MAX_AGE), e.g. 0 to measure connecting on every request')
+        parser.add_argument('--endpoints', default=','.join(DEFAULT_ENDPOINTS), help='Comma separated paths to benchmark')
+        parser.add_argument('--media', action='append', default=[], help='Path under MEDIA_ROOT to include (repeatable)')
+        parser.add_argument('--output', help='Write the JSON report to this file')
+        parser.add_argument('--baseline', default=str(DEFAULT_BASELINE), help='Baseline JSON to diff against (default: benchmarks/baseline.json)')
+        parser.add_argument('--save-baseline', action='store_true', help='Store this run as the new baseline')
+        parser.add_argument('--threshold', type=float, default=10.0, help='Regression threshold in percent for p95 and throughput (default: 10)')
+        parser.add_argument('--fail-on-regression', action='store_true', help='Exit non-zero when a regression is detected')
+
+    def handle(self, *args, **options):
+        sizes = [int(size) for size in options['sizes'].split(',') if size]
+        modes = {
+            'both': ['inprocess', 'gunicorn'],
+            'servers': ['gunicorn', 'uvicorn'],
+        }.get(options['mode'], [options['mode']])
+        endpoints = [path for path in options['endpoints'].split(',') if path]
+        endpoints += [settings.MEDIA_URL + path.lstrip('/') for path in options['media']]
+
+        report = {
+            'created': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'python': sys.version.split()[0],
+            'database': connection.vendor,
+            'requests': options['requests'],
+            'concurrency': options['concurrency'],
+            'conn_max_age': connection.settings_dict['CONN_MAX_AGE'] if options['conn_max_age'] is None else options['conn_max_age'],
+            'results': {},
+        }
+
+        with tempfile.TemporaryDirectory(prefix='bench-') as workdir:
+            for size in sizes:
+                self.stdout.write(f'Seeding {size} rows per content model...')
+                old_name = self.create_database(workdir, size)
+                try:
+                    start = time.perf_counter()
+                    generate({name: size for name in GENERATORS}, seed=options['seed'])
+                    self.stdout.write(f'  seeded in {time.perf_counter() - start:.1f}s')
+                    for mode in modes:
+                        key = f'{mode}/{size}'
+                        if mode == 'inprocess':
+                            report['results'][key] = self.run_inprocess(key, endpoints, workdir, options)
+                        elif mode == 'render':
+                            report['results'][key] = self.run_render(size, options)
+                        else:
+                            report['results'][key] = self.run_server(mode, key, endpoints, workdir, options)
+                        self.print_results(key, report['results'][key])
+                finally:
+                    connection.creation.destroy_test_db(old_name, verbosity=0)
+
+        if 'render' in modes and len(sizes) > 1:
+            self.print_scaling(report, sizes)
+
+        baseline_path = Path(options['baseline'])
+        if baseline_path.exists() and not options['save_baseline']:
+            report['diff'] = self.diff(json.loads(baseline_path.read_text()), report, options['threshold'])
+
+        output = json.dumps(report, indent=2)
+        if options['output']:
+            Path(options['output']).write_text(output)
+        self.stdout.write(output)
+
+        if options['save_baseline']:
+            baseline_path.parent.mkdir(parents=True, exist_ok=True)
+            baseline_path.write_text(output)
+            self.stdout.write(self.style.SUCCESS(f'Baseline saved to {baseline_path}'))
+
+        # With persistent or pooled connections, warm workers must not connect
+        reconnects = [
+            (key, path, metrics['connections_per_request'])
+            for key, results in report['results'].items()
+            if results.get('pooled') or results.get('conn_max_age', 0) != 0
+            for path, metrics in results.items()
+            if isinstance(metrics, dict) and (metrics.get('connections_per_request') or 0) > 0
+        ]
+        for key, path, per_request in reconnects:
+            self.stdout.write(self.style.ERROR(f'Connection reuse: {key} {path} opened {per_request} connections/req'))
+
+        regressions = [entry for entry in report.get('diff', []) if entry['regression']]
+        for entry in regressions:
+            self.stdout.write(self.style.ERROR(f"Regression: {entry['key']} {entry['endpoint']} {entry['metric']} {entry['change_pct']:+.1f}%"))
+        if regressions and options['fail_on_regression']:
+            raise CommandError(f'{len(regressions)} regression(s) against {baseline_path}')
+        if reconnects:
+            raise CommandError(f'{len(reconnects)} endpoint(s) opened database connections despite CONN_MAX_AGE/pooling')
+
+    def create_database(self, workdir, size):
+        """Create an isolated, migrated database; returns the original name"""
+        old_name = connection.settings_dict['NAME']
+        if connection.vendor == 'sqlite':
+            # On disk, so a gunicorn subprocess can open it too
+            connection.settings_dict.setdefault('TEST', {})['NAME'] = os.path.join(workdir, f'bench-{size}.sqlite3')
+        connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+        return old_name
+
+    def count_connection(self, sender, connection, **kwargs):
+        self.connections_opened += 1
+
+    def run_inprocess(self, key, endpoints, workdir, options):
+        from app import content
+
+        results = {}
+        # A fresh cache per run: pages cached for a previous size must not be served
+        cache_dir = os.path.join(workdir, f"cache-{key.replace('/', '-')}")
+        caches = {alias: dict(config) for alias, config in settings.CACHES.items()}
+        for config in caches.values():
+            if config['BACKEND'].endswith(('FileBasedCache', 'FileCache')):
+                config['LOCATION'] = cache_dir
+
+        # One log line per request would dominate the measurement
+        performance_logger = logging.getLogger('app.performance')
+        log_level = performance_logger.level
+        performance_logger.setLevel(logging.WARNING)
+        conn_max_age = connection.settings_dict['CONN_MAX_AGE']
+        if options['conn_max_age'] is not None:
+            connection.settings_dict['CONN_MAX_AGE'] = options['conn_max_age']
+        # The test client never closes connections between requests, so
+        # this only shows connections a view opens itself
+        self.connections_opened = 0
+        connection_created.connect(self.count_connection)
+        setup_test_environment()
+        try:
+            with override_settings(CACHES=caches, ALLOWED_HOSTS=['*'], QUERY_BUDGET_STRICT=False):
+                # The seeding bumped the version in the project's cache, not
+                # this one; drop this process's snapshot of the previous size
+                content._snapshot = None
+                content.bump_content_version()
+                client = Client()
+                for path in endpoints:
+                    cold_start = time.perf_counter()
+                    client.get(path)
+                    cold = time.perf_counter() - cold_start
+                    for _ in range(options['warmup']):
+                        client.get(path)
+
+                    latencies, queries, sizes, statuses, connections = [], [], [], [], []
+                    start = time.perf_counter()
+                    for _ in range(options['requests']):
+                        opened = self.connections_opened
+                        with CaptureQueriesContext(connection) as captured:
+                            request_start = time.perf_counter()
+                            response = client.get(path)
+                            body = b''.join(response.streaming_content) if response.streaming else response.content
+                            latencies.append(time.perf_counter() - request_start)
+                        queries.append(len(captured))
+                        connections.append(self.connections_opened - opened)
+                        sizes.append(len(body))
+                        statuses.append(response.status_code)
+                    elapsed = time.perf_counter() - start
+
+                    results[path] = summarize(latencies, elapsed, queries, sizes, statuses, connections)
+                    results[path]['cold_ms'] = round(cold * 1000, 2)
+        finally:
+            teardown_test_environment()
+            connection_created.disconnect(self.count_connection)
+            connection.settings_dict['CONN_MAX_AGE'] = conn_max_age
+            performance_logger.setLevel(log_level)
+
+        results['peak_rss_kb'] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return results
+
+    def run_render(self, size, options):
+        """Time each cached section of index.html, rendered from the snapshot
+        with no fragment or page cache in the way"""
+        from django.template.loader import get_template
+        from app.content import SECTION_MODELS, build_snapshot
+
+        context = build_snapshot().as_context()
+        results = {}
+        for section in SECTION_MODELS:
+            template = get_template(f'sections/{section}.html')
+            for _ in range(options['warmup']):
+                template.render(context)
+            latencies = []
+            for _ in range(options['requests']):
+                start = time.perf_counter()
+                html = template.render(context)
+                latencies.append(time.perf_counter() - start)
+            latencies.sort()
+            size_bytes = len(html.encode())
+            results[f'sections/{section}'] = {
+                'renders': len(latencies),
+                'p50_ms': round(percentile(latencies, 50) * 1000, 3),
+                'p95_ms': round(percentile(latencies, 95) * 1000, 3),
+                'bytes': size_bytes,
+                'bytes_per_row': round(size_bytes / size) if size else None,
+                'us_per_row': round(percentile(latencies, 50) * 1e6 / size, 2) if size else None,
+            }
+        results['peak_rss_kb'] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return results
+
+    def print_scaling(self, report, sizes):
+        """Growth of each section from the smallest to the largest size"""
+        first, last = f'render/{sizes[0]}', f'render/{sizes[-1]}'
+        factor = sizes[-1] / sizes[0]
+        self.stdout.write(f'Section growth for {factor:g}x the rows (linear = {factor:g}x):')
+        for path, metrics in report['results'][first].items():
+            if not isinstance(metrics, dict):
+                continue
+            largest = report['results'][last][path]
+            self.stdout.write(
+                f"  {path}: bytes {largest['bytes'] / metrics['bytes']:.1f}x, "
+                f"p50 {largest['p50_ms'] / metrics['p50_ms']:.1f}x"
+            )
+
+    def run_server(self, server, key, endpoints, workdir, options):
+        port = free_port()
+        base_url = f'http://127.0.0.1:{port}'
+        env = dict(os.environ)
+        env['DATABASE_URL'] = database_url(connection.settings_dict)
+        env['CACHE_DIR'] = os.path.join(workdir, f"cache-{key.replace('/', '-')}")
+        env['QUERY_BUDGET_STRICT'] = 'False'
+        env['PERFORMANCE_LOG_LEVEL'] = 'WARNING'
+        if options['conn_max_age'] is not None:
+            env['DB_CONN_MAX_AGE'] = str(options['conn_max_age'])
+        env.setdefault('DJANGO_SETTINGS_MODULE', 'settings')
+
+        if server == 'uvicorn':
+            env['ASYNC_VIEWS'] = 'True'
+            command = ['uvicorn', '--host', '127.0.0.1', '--port', str(port), '--workers', str(options['workers']), '--log-level', 'warning', '--no-access-log', 'asgi:application']
+        else:
+            env['ASYNC_VIEWS'] = 'False'
+            command = ['gunicorn', '--bind', f'127.0.0.1:{port}', '--workers', str(options['workers']), '--log-level', 'warning', 'wsgi:application']
+
+        process = subprocess.Popen(
+            [sys.executable, '-m', *command],
+            cwd=settings.BASE_DIR,
+            env=env,
+        )
+        results = {}
+        try:
+            health = self.wait_until_ready(base_url, process)
+            # What the server runs with: connections are expected to be reused
+            # when CONN_MAX_AGE is not 0 or a pool is configured
+            results['conn_max_age'] = health.get('conn_max_age', 0)
+            results['pooled'] = 'pool' in health
+            warmup = max(options['warmup'], options['workers'] * options['concurrency'])
+            for path in endpoints:
+                url = base_url + path
+                cold = self.fetch(url)[0]
+                # Concurrently, so that every worker has connected before measuring
+                with ThreadPoolExecutor(max_workers=options['concurrency']) as pool:
+                    list(pool.map(lambda _: self.fetch(url), range(warmup)))
+
+                start = time.perf_counter()
+                with ThreadPoolExecutor(max_workers=options['concurrency']) as pool:
+                    samples = list(pool.map(lambda _: self.fetch(url), range(options['requests'])))
+                elapsed = time.perf_counter() - start
+
+                latencies = [sample[0] for sample in samples]
+                statuses = [sample[1] for sample in samples]
+                sizes = [sample[2] for sample in samples]
+                queries = [sample[3] for sample in samples if sample[3] is not None]
+                connections = [sample[4] for sample in samples if sample[4] is not None]
+                results[path] = summarize(latencies, elapsed, queries, sizes, statuses, connections)
+                results[path]['cold_ms'] = round(cold * 1000, 2)
+            # Master plus workers, read while they are still alive
+            results['peak_rss_kb'] = process_tree_hwm(process.pid)
+        finally:
+            process.terminate()
+            process.wait(timeout=30)
+        return results
+
+    def wait_until_ready(self, base_url, process, timeout=30):
+        """Wait for the server's readiness probe; returns its JSON"""
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            if process.poll() is not None:
+                raise CommandError('The server exited during startup')
+            try:
+                with urlopen(base_url + '/health/', timeout=1) as response:
+                    return json.loads(response.read())
+            except (OSError, HTTPError):
+                time.sleep(0.2)
+        raise CommandError('The server did not become ready in time')
+
+    def fetch(self, url):
+        """Return (latency, status, body size, query count or None, new connections or None)"""
+        start = time.perf_counter()
+        try:
+            with urlopen(url, timeout=60) as response:
+                body = response.read()
+                status, headers = response.status, response.headers
+        except HTTPError as error:
+            body = error.read()
+            status, headers = error.code, error.headers
+        latency = time.perf_counter() - start
+
+        # RequestTimingMiddleware reports the query count and any new
+        # database connection in Server-Timing
+        server_timing = headers.get('Server-Timing')
+        if not server_timing:
+            return latency, status, len(body), None, None
+        match = re.search(r'desc="(\d+) queries"', server_timing)
+        connected = re.search(r'db-connect;desc="(\d+) new"', server_timing)
+        return latency, status, len(body), int(match.group(1)) if match else None, int(connected.group(1)) if connected else 0
+
+    def print_results(self, key, results):
+        for path, metrics in results.items():
+            if not isinstance(metrics, dict):
+                continue
+            if 'renders' in metrics:
+                self.stdout.write(
+                    f"  {key} {path}: p50 {metrics['p50_ms']}ms, p95 {metrics['p95_ms']}ms, "
+                    f"{metrics['bytes']} bytes, {metrics['bytes_per_row']} bytes/row, {metrics['us_per_row']}us/row"
+                )
+                continue
+            self.stdout.write(
+                f"  {key} {path}: {metrics['throughput_rps']} req/s, "
+                f"p50 {metrics['p50_ms']}ms, p95 {metrics['p95_ms']}ms, p99 {metrics['p99_ms']}ms, "
+                f"{metrics['queries_per_request']} queries/req, "
+                f"{metrics['connections_per_request']} connections/req"
+            )
+        self.stdout.write(f"  {key} peak RSS: {results['peak_rss_kb'] / 1024:.1f} MB")
+
+    def diff(self, baseline, report, threshold):
+        """Compare p95 latency and throughput with the baseline run"""
+        changes = []
+        for key, results in report['results'].items():
+            base_results = baseline.get('results', {}).get(key, {})
+            for path, metrics in results.items():
+                base = base_results.get(path)
+                if not isinstance(metrics, dict) or not isinstance(base, dict):
+                    continue
+                for metric, higher_is_worse in (('p95_ms', True), ('throughput_rps', False)):
+                    if not base.get(metric) or metrics.get(metric) is None:
+                        continue
+                    change = (metrics[metric] - base[metric]) / base[metric] * 100
+                    worse = change if higher_is_worse else -change
+                    changes.append({
+                        'key': key,
+                        'endpoint': path,
+                        'metric': metric,
+                        'baseline': base[metric],
+                        'current': metrics[metric],
+                        'change_pct': round(change, 1),
+                        'regression': worse > threshold,
+                    })
+        return changes
@@ -0,0 +1,82 @@
+from django.apps import apps
+from django.core.management.base import BaseCommand
+from django.core.files.storage import default_storage
+from app.images import IMAGE_DERIVATIVE_WORKERS, IMAGE_FIELDS, job_name, pending_images, pending_jobs, process_upload
+from app.storage import exists_many
+from concurrent.futures import ThreadPoolExecutor
+import time
+
+
+class Command(BaseCommand):
+    help = 'Build resized WebP/AVIF derivatives and inline placeholders for every uploaded image'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--force',
+            action='store_true',
+            help='Rebuild images that were already processed'
+        )
+        parser.add_argument(
+            '--pending',
+            action='store_true',
+            help='Only resume the jobs recorded under derivatives/pending/ (interrupted or failed uploads)'
+        )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=IMAGE_DERIVATIVE_WORKERS,
+            help=f'Parallel image workers (default: {IMAGE_DERIVATIVE_WORKERS})'
+        )
+
+    def handle(self, *args, **options):
+        if options['pending']:
+            candidates = []
+            for model, pk, field, name, failures in pending_jobs():
+                if failures:
+                    self.stdout.write(f'  {name} failed {failures} time(s) before, retrying')
+                candidates.append((model, pk, field, name))
+        else:
+            candidates = self.find_images(options['force'])
+
+        existing = exists_many(default_storage, {job[3] for job in candidates})
+        jobs = []
+        for job in candidates:
+            if job[3] not in existing:
+                self.stdout.write(self.style.WARNING(f'  {job[3]} is missing from storage, skipped'))
+                if options['pending']:
+                    default_storage.delete(job_name(*job[:3]))
+                continue
+            jobs.append(job)
+        self.stdout.write(f'{len(jobs)} images to process')
+
+        start = time.perf_counter()
+        built = 0
+        with ThreadPoolExecutor(max_workers=options['workers']) as pool:
+            futures = [(job[3], pool.submit(process_upload, *job, force=options['force'])) for job in jobs]
+            for name, future in futures:
+                manifest = future.result()
+                if manifest is None:
+                    self.stdout.write(self.style.ERROR(f'  {name} failed, see the log'))
+                    continue
+                built += 1
+                original = default_storage.size(name)
+                for fmt, variants in manifest['variants'].items():
+                    width, largest = variants[-1]
+                    self.stdout.write(
+                        f'  {name} -> {len(variants)} {fmt} '
+                        f'({width}px: {default_storage.size(largest) // 1024}K vs {original // 1024}K original)'
+                    )
+
+        self.stdout.write(self.style.SUCCESS(f'Processed {built} images in {time.perf_counter() - start:.1f}s'))
+
+    def find_images(self, force):
+        candidates = []
+        for model_name, fields in IMAGE_FIELDS.items():
+            model = apps.get_model('app', model_name)
+            for instance in model.objects.all():
+                todo = fields if force else pending_images(instance)
+                for field in todo:
+                    name = getattr(instance, field).name
+                    if name:
+                        candidates.append((model, instance.pk, field, name))
+        return candidates
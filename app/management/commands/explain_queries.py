@@ -0,0 +1,67 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from app.content import content_querysets
+from app.models import ThemeSettings
+
+
+class Command(BaseCommand):
+    help = 'EXPLAIN the public read queries and report whether they use an index'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--no-seqscan',
+            action='store_true',
+            help='PostgreSQL: discourage sequential scans, to check an index is usable on a small table'
+        )
+        parser.add_argument('--verbose-plan', action='store_true', help='Print the full plan of every query')
+        parser.add_argument('--fail-on-scan', action='store_true', help='Exit non-zero if a query does not use an index')
+
+    def handle(self, *args, **options):
+        if connection.vendor not in ('sqlite', 'postgresql'):
+            raise CommandError(f'Unsupported database: {connection.vendor}')
+
+        queries = dict(content_querysets())
+        queries['theme'] = ThemeSettings.objects.filter(is_active=True)
+
+        missing = []
+        with transaction.atomic():
+            if options['no_seqscan'] and connection.vendor == 'postgresql':
+                with connection.cursor() as cursor:
+                    cursor.execute('SET LOCAL enable_seqscan = off')
+
+            for name, queryset in queries.items():
+                plan = queryset.explain()
+                index = self.index_used(queryset.model, plan)
+                sorts = self.needs_sort(plan)
+
+                if index:
+                    status = self.style.SUCCESS(f'index {index}')
+                else:
+                    status = self.style.ERROR('no index (full scan)')
+                    missing.append(name)
+                note = self.style.WARNING(', extra sort') if sorts else ''
+                self.stdout.write(f'{name:18} {queryset.model._meta.db_table:28} {status}{note}')
+                if options['verbose_plan'] or not index:
+                    for line in plan.splitlines():
+                        self.stdout.write(f'    {line}')
+
+        if connection.vendor == 'postgresql' and missing and not options['no_seqscan']:
+            self.stdout.write('PostgreSQL prefers sequential scans on small tables; try --no-seqscan')
+        if missing and options['fail_on_scan']:
+            raise CommandError(f"No index used for: {', '.join(missing)}")
+
+    def index_used(self, model, plan):
+        """Name of the model's index or unique constraint the plan uses, if any"""
+        names = [index.name for index in model._meta.indexes]
+        names += [constraint.name for constraint in model._meta.constraints]
+        for name in names:
+            # SQLite: "SCAN app_skill USING INDEX skill_active_order_idx"
+            # PostgreSQL: "Index Scan using skill_active_order_idx on app_skill"
+            if name in plan:
+                return name
+        return None
+
+    def needs_sort(self, plan):
+        if connection.vendor == 'sqlite':
+            return 'USE TEMP B-TREE FOR ORDER BY' in plan
+        return any(line.strip().lstrip('-> ').startswith('Sort ') for line in plan.splitlines())
@@ -0,0 +1,35 @@
+from django.core.management.base import BaseCommand, CommandError
+from app.export import EXPORT_ROOT, export_site
+import time
+
+
+class Command(BaseCommand):
+    help = 'Render the public pages to precompressed, content-hashed files in EXPORT_ROOT'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--root',
+            default=str(EXPORT_ROOT),
+            help=f'Export directory (default: {EXPORT_ROOT})'
+        )
+        parser.add_argument(
+            '--no-compress',
+            action='store_true',
+            help='Skip the gzip/brotli variants'
+        )
+
+    def handle(self, *args, **options):
+        start = time.perf_counter()
+        try:
+            result = export_site(root=options['root'], compress=not options['no_compress'])
+        except RuntimeError as e:
+            raise CommandError(str(e)) from e
+        elapsed = time.perf_counter() - start
+
+        for name in result['written']:
+            self.stdout.write(f'  wrote {name}')
+        for name in result['reused']:
+            self.stdout.write(f'  unchanged {name}')
+        self.stdout.write(self.style.SUCCESS(
+            f"Exported content version {result['version']} to {options['root']} in {elapsed:.2f}s"
+        ))
@@ -1,12 +1,52 @@
 from django.core.management.base import BaseCommand
-from django.core.files import File
 from django.conf import settings
+from concurrent.futures import ThreadPoolExecutor, as_completed
+import hashlib
+import json
 import os
+import time
 from pathlib import Path
 
+# Kept in the destination so it survives with the volume it describes
+MANIFEST_NAME = '.upload_manifest.json'
+PART_SUFFIX = '.part'
+BUFFER_SIZE = 1024 * 1024
+# Save progress at least this often so an interrupted run can resume
+SAVE_EVERY = 5.0
+
+
+def hash_file(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(BUFFER_SIZE), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def copy_file(source, dest, st):
+    """
+    Stream ``source`` to ``dest`` through a bounded buffer, hashing on the way.
+
+    The data goes to ``dest.part`` first and is renamed into place, so readers
+    never see a partial file and an interrupted copy is simply redone.
+    """
+    dest.parent.mkdir(parents=True, exist_ok=True)
+    part = dest.with_name(dest.name + PART_SUFFIX)
+    digest = hashlib.sha256()
+    buffer = bytearray(BUFFER_SIZE)
+    view = memoryview(buffer)
+    with open(source, 'rb') as src, open(part, 'wb') as dst:
+        while n := src.readinto(buffer):
+            digest.update(view[:n])
+            dst.write(view[:n])
+    # Keep the source mtime: it feeds the media ETag/Last-Modified
+    os.utime(part, ns=(st.st_atime_ns, st.st_mtime_ns))
+    os.replace(part, dest)
+    return digest.hexdigest()
+
 
 class Command(BaseCommand):
-    help = 'Upload local media files to Railway storage'
+    help = 'Sync local media files to Railway storage (incremental, parallel)'
 
     def add_arguments(self, parser):
         parser.add_argument(
@@ -15,10 +55,71 @@ class Command(BaseCommand):
             default='media',
             help='Source directory to upload from (default: media)'
         )
+        parser.add_argument(
+            '--dest',
+            type=str,
+            default=str(settings.MEDIA_ROOT),
+            help=f'Destination directory (default: MEDIA_ROOT, {settings.MEDIA_ROOT})'
+        )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=min(32, (os.cpu_count() or 1) * 4),
+            help='Parallel copies (default: 4 per CPU, at most 32)'
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Only report what would be copied'
+        )
+        parser.add_argument(
+            '--full',
+            action='store_true',
+            help='Ignore the manifest and copy every file'
+        )
+
+    def load_manifest(self, path):
+        try:
+            with open(path) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def save_manifest(self, path, manifest):
+        tmp = path.with_name(path.name + PART_SUFFIX)
+        with open(tmp, 'w') as f:
+            json.dump(manifest, f, separators=(',', ':'), sort_keys=True)
+        os.replace(tmp, path)
+
+    def plan(self, source_dir, dest_dir, manifest, full):
+        """Yield (rel_path, stat, reason) for every source file; reason is None when it is up to date"""
+        for root, dirs, files in os.walk(source_dir):
+            dirs[:] = [d for d in dirs if not d.startswith('.')]
+            for file in files:
+                if file.startswith('.') or file.endswith(PART_SUFFIX):
+                    continue
+                source_file = Path(root) / file
+                rel_path = source_file.relative_to(source_dir).as_posix()
+                st = source_file.stat()
+                entry = manifest.get(rel_path)
+                try:
+                    dest_size = (dest_dir / rel_path).stat().st_size
+                except OSError:
+                    dest_size = None
+
+                if full or entry is None:
+                    yield rel_path, st, 'new' if dest_size is None else 'unknown'
+                elif dest_size != st.st_size:
+                    yield rel_path, st, 'missing' if dest_size is None else 'changed'
+                elif entry[:2] != [st.st_size, st.st_mtime_ns]:
+                    # Touched, or rewritten with the same size: let the hash decide
+                    yield rel_path, st, 'modified'
+                else:
+                    yield rel_path, st, None
 
     def handle(self, *args, **options):
         source_dir = Path(options['source'])
-        
+
         if not source_dir.exists():
             self.stdout.write(
                 self.style.ERROR(f'Source directory {source_dir} does not exist')
@@ -26,33 +127,69 @@ class Command(BaseCommand):
             return
 
         # Ensure storage directory exists
-        storage_dir = Path(settings.MEDIA_ROOT)
+        storage_dir = Path(options['dest'])
         storage_dir.mkdir(parents=True, exist_ok=True)
-        
-        uploaded_count = 0
-        
-        # Walk through all files in source directory
-        for root, dirs, files in os.walk(source_dir):
-            for file in files:
-                source_file = Path(root) / file
-                
-                # Calculate relative path
-                rel_path = source_file.relative_to(source_dir)
-                dest_file = storage_dir / rel_path
-                
-                # Create destination directory if needed
-                dest_file.parent.mkdir(parents=True, exist_ok=True)
-                
-                # Copy file
-                with open(source_file, 'rb') as f:
-                    with open(dest_file, 'wb') as dest_f:
-                        dest_f.write(f.read())
-                
-                uploaded_count += 1
-                self.stdout.write(
-                    self.style.SUCCESS(f'Uploaded: {rel_path}')
-                )
-        
+        manifest_path = storage_dir / MANIFEST_NAME
+        manifest = self.load_manifest(manifest_path)
+
+        start = time.perf_counter()
+        files = list(self.plan(source_dir, storage_dir, manifest, options['full']))
+        todo = [job for job in files if job[2]]
+        scanned = time.perf_counter() - start
+        total_bytes = sum(st.st_size for _, st, _ in todo)
         self.stdout.write(
-            self.style.SUCCESS(f'Successfully uploaded {uploaded_count} files to {storage_dir}')
+            f'{len(todo)} of {len(files)} files ({total_bytes / 1e6:.1f} MB) to sync, found in {scanned:.2f}s'
+        )
+
+        if options['dry_run']:
+            for rel_path, st, reason in todo:
+                self.stdout.write(f'  would copy {rel_path} ({reason}, {st.st_size} bytes)')
+            return
+
+        def sync(rel_path, st, reason):
+            source_file = source_dir / rel_path
+            entry = manifest.get(rel_path)
+            if reason == 'modified':
+                digest = hash_file(source_file)
+                if digest == entry[2]:
+                    return rel_path, st, digest, False
+            digest = copy_file(source_file, storage_dir / rel_path, st)
+            return rel_path, st, digest, True
+
+        copied = unchanged = failed = copied_bytes = 0
+        last_save = time.monotonic()
+        try:
+            with ThreadPoolExecutor(max_workers=options['workers']) as pool:
+                futures = {pool.submit(sync, *job): job[0] for job in todo}
+                for future in as_completed(futures):
+                    try:
+                        rel_path, st, digest, was_copied = future.result()
+                    except OSError as e:
+                        failed += 1
+                        self.stdout.write(self.style.ERROR(f'Failed: {futures[future]} ({e})'))
+                        continue
+                    # Only this thread touches the manifest
+                    manifest[rel_path] = [st.st_size, st.st_mtime_ns, digest]
+                    if was_copied:
+                        copied += 1
+                        copied_bytes += st.st_size
+                        self.stdout.write(self.style.SUCCESS(f'Uploaded: {rel_path}'))
+                    else:
+                        unchanged += 1
+                    if time.monotonic() - last_save > SAVE_EVERY:
+                        self.save_manifest(manifest_path, manifest)
+                        last_save = time.monotonic()
+        finally:
+            # Also on Ctrl-C: the next run resumes after the files done so far
+            self.save_manifest(manifest_path, manifest)
+
+        elapsed = time.perf_counter() - start
+        self.stdout.write(
+            self.style.SUCCESS(
+                f'Uploaded {copied} files ({copied_bytes / 1e6:.1f} MB) to {storage_dir} in {elapsed:.2f}s '
+                f'({copied_bytes / 1e6 / max(elapsed, 1e-9):.1f} MB/s), '
+                f'{len(files) - len(todo)} up to date, {unchanged} unchanged after hashing'
+            )
         )
+        if failed:
+            self.stdout.write(self.style.ERROR(f'{failed} files failed, run again to retry them'))
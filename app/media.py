@@ -0,0 +1,236 @@
+"""
+Serving uploads from MEDIA_ROOT in production.
+
+``django.views.static.serve`` is meant for development: it re-stats and
+re-reads every file, has no Range support and sends no caching headers.
+``serve_media`` is a small replacement for the local filesystem storage:
+
+* strong ETag (size, mtime, inode) and Last-Modified, answering
+  If-None-Match / If-Modified-Since with 304 without opening the file;
+* single byte ranges (Range / If-Range) with 206 and 416;
+* ``Cache-Control: immutable`` for the content-hashed files the app writes
+  itself (image derivatives, compiled theme stylesheets), a short max-age
+  for everything else, uploads included;
+* the file is handed to the server as a real file object positioned at the
+  start of the range, so gunicorn can send it with ``os.sendfile``; other
+  servers read it through the same bounded wrapper;
+* a per-worker cache of stat results (including misses), so hot files and
+  404s cost no syscalls until the entry expires.
+"""
+import mimetypes
+import os
+import re
+import stat
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.exceptions import SuspiciousFileOperation
+from django.http import FileResponse, Http404, HttpResponse
+from django.utils._os import safe_join
+from django.utils.http import http_date, parse_http_date_safe
+
+# Cache-Control max-age for names that are not content-hashed (seconds)
+MEDIA_MAX_AGE = getattr(settings, 'MEDIA_MAX_AGE', 60 * 60)
+# How long a stat result is trusted (seconds)
+MEDIA_STAT_CACHE_TTL = getattr(settings, 'MEDIA_STAT_CACHE_TTL', 5)
+MEDIA_STAT_CACHE_SIZE = getattr(settings, 'MEDIA_STAT_CACHE_SIZE', 4096)
+
+IMMUTABLE_MAX_AGE = 60 * 60 * 24 * 365
+# Names that embed a digest of their content: derivatives/<stem>.<digest>.<width>w.<format>
+# (app/images.py) and theme/theme.<digest>.css (app/themecss.py). Only these
+# prefixes: an upload may well be called "report.20240101.png" and still be
+# replaced under the same name.
+HASHED_NAME_RE = re.compile(
+    r'^(?:derivatives/.+\.[0-9a-f]{10}\.\d+w\.(?:avif|webp)|theme/theme\.[0-9a-f]{12}\.css)$'
+)
+RANGE_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
+BLOCK_SIZE = 64 * 1024
+
+
+class FileInfo:
+    __slots__ = ('path', 'size', 'mtime', 'etag', 'last_modified', 'content_type', 'cache_control')
+
+    def __init__(self, path, st):
+        self.path = path
+        self.size = st.st_size
+        self.mtime = int(st.st_mtime)
+        self.etag = f'"{st.st_size:x}-{st.st_mtime_ns:x}-{st.st_ino:x}"'
+        self.last_modified = http_date(st.st_mtime)
+        content_type, encoding = mimetypes.guess_type(path)
+        # Never let a browser transparently decompress a stored .gz
+        self.content_type = 'application/octet-stream' if encoding else (content_type or 'application/octet-stream')
+        name = os.path.relpath(path, settings.MEDIA_ROOT).replace(os.sep, '/')
+        if HASHED_NAME_RE.match(name):
+            self.cache_control = f'public, max-age={IMMUTABLE_MAX_AGE}, immutable'
+        else:
+            self.cache_control = f'public, max-age={MEDIA_MAX_AGE}'
+
+
+class StatCache:
+    """Per-process LRU of path -> FileInfo (or None for a missing file)"""
+
+    def __init__(self, ttl=MEDIA_STAT_CACHE_TTL, size=MEDIA_STAT_CACHE_SIZE):
+        self.ttl = ttl
+        self.size = size
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, path):
+        now = time.monotonic()
+        with self._lock:
+            entry = self._data.get(path)
+            if entry is not None and entry[1] > now:
+                self._data.move_to_end(path)
+                return entry[0]
+
+        try:
+            st = os.stat(path)
+            info = FileInfo(path, st) if stat.S_ISREG(st.st_mode) else None
+        except (OSError, ValueError):
+            info = None
+
+        with self._lock:
+            self._data[path] = (info, now + self.ttl)
+            self._data.move_to_end(path)
+            while len(self._data) > self.size:
+                self._data.popitem(last=False)
+        return info
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+
+stat_cache = StatCache()
+
+
+class FileRange:
+    """
+    ``length`` bytes of an open file from its current position.
+
+    ``fileno()`` exposes the real descriptor so the WSGI server can use
+    sendfile (gunicorn sends exactly Content-Length bytes from the current
+    offset); ``read()`` never goes past the end of the range for servers
+    that copy through Python.
+    """
+
+    def __init__(self, file, start, length):
+        self.file = file
+        self.end = start + length
+        file.seek(start)
+
+    def fileno(self):
+        return self.file.fileno()
+
+    def read(self, size=-1):
+        remaining = self.end - self.file.tell()
+        if remaining <= 0:
+            return b''
+        if size is None or size < 0 or size > remaining:
+            size = remaining
+        return self.file.read(size)
+
+    def seek(self, offset, whence=os.SEEK_SET):
+        return self.file.seek(offset, whence)
+
+    def tell(self):
+        return self.file.tell()
+
+    def seekable(self):
+        # Keeps FileResponse from deriving Content-Length from the whole file
+        return False
+
+    def close(self):
+        self.file.close()
+
+
+def not_modified(request, info):
+    if_none_match = request.headers.get('If-None-Match')
+    if if_none_match is not None:
+        # Weak comparison, as RFC 9110 prescribes for If-None-Match
+        tags = [tag.strip().removeprefix('W/') for tag in if_none_match.split(',')]
+        return '*' in tags or info.etag in tags
+    since = parse_http_date_safe(request.headers.get('If-Modified-Since', ''))
+    return since is not None and info.mtime <= since
+
+
+def requested_range(request, info):
+    """
+    Return (start, length) for a satisfiable single-range request, None to
+    send the whole file, or False if the range cannot be satisfied.
+    """
+    header = request.headers.get('Range')
+    if not header or info.size == 0:
+        return None
+    if_range = request.headers.get('If-Range')
+    if if_range and if_range != info.etag and parse_http_date_safe(if_range) != info.mtime:
+        # The client's copy is outdated: send the current file in full
+        return None
+    match = RANGE_RE.match(header.strip())
+    if not match:
+        # Multiple ranges or another unit: ignoring Range is allowed
+        return None
+    first, last = match.groups()
+    if first:
+        start = int(first)
+        end = min(int(last), info.size - 1) if last else info.size - 1
+    elif last:
+        start = max(info.size - int(last), 0)
+        end = info.size - 1
+    else:
+        return None
+    if start >= info.size or end < start:
+        return False
+    return start, end - start + 1
+
+
+def serve_media(request, path):
+    """Serve ``path`` from MEDIA_ROOT (GET/HEAD only)"""
+    if request.method not in ('GET', 'HEAD'):
+        return HttpResponse(status=405, headers={'Allow': 'GET, HEAD'})
+    if any(part.startswith('.') for part in path.split('/')):
+        # Dotfiles such as the upload_media manifest are not public
+        raise Http404('Not found')
+    try:
+        full_path = safe_join(settings.MEDIA_ROOT, path)
+    except (SuspiciousFileOperation, ValueError):
+        raise Http404('Not found')
+
+    info = stat_cache.get(full_path)
+    if info is None:
+        raise Http404('Not found')
+
+    headers = {
+        'ETag': info.etag,
+        'Last-Modified': info.last_modified,
+        'Cache-Control': info.cache_control,
+        'Accept-Ranges': 'bytes',
+    }
+    if not_modified(request, info):
+        return HttpResponse(status=304, headers=headers)
+
+    byte_range = requested_range(request, info)
+    if byte_range is False:
+        headers['Content-Range'] = f'bytes */{info.size}'
+        return HttpResponse(status=416, headers=headers)
+    start, length = byte_range or (0, info.size)
+    if byte_range:
+        headers['Content-Range'] = f'bytes {start}-{start + length - 1}/{info.size}'
+    status = 206 if byte_range else 200
+
+    if request.method == 'HEAD':
+        response = HttpResponse(status=status, content_type=info.content_type, headers=headers)
+        response['Content-Length'] = length
+        return response
+
+    try:
+        file = open(full_path, 'rb')
+    except OSError:
+        # Deleted since it was stat'ed
+        raise Http404('Not found')
+    response = FileResponse(FileRange(file, start, length), status=status, content_type=info.content_type, headers=headers)
+    response.block_size = BLOCK_SIZE
+    response['Content-Length'] = length
+    return response
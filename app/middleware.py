@@ -1,7 +1,81 @@
+import json
+import logging
+import os
+import time
+import weakref
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connection
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
 from django.http import HttpResponseForbidden
 from django.shortcuts import redirect
 from django.urls import reverse
 from django.contrib.auth import views as auth_views
+from whitenoise.base import WhiteNoise
+from whitenoise.middleware import WhiteNoiseMiddleware
+from whitenoise.responders import MissingFileError
+
+from .content import get_content_version, aget_content_version
+from .export import EXPORT_ROOT, EXPORT_URL, manifest_path, read_manifest, schedule_export
+
+performance_logger = logging.getLogger('app.performance')
+
+# Named timings ("render", ...) collected for the current request
+_request_timings = ContextVar('request_timings', default=None)
+# Database connections opened during the current request
+_request_connections = ContextVar('request_connections', default=None)
+# Connections a psycopg pool has handed out in this process
+_pooled_connections = weakref.WeakSet()
+
+
+@receiver(connection_created)
+def count_connection(sender, connection, **kwargs):
+    if getattr(connection, 'pool', None) is not None:
+        # Sent on every checkout from the pool; only the first one connected
+        if connection.connection in _pooled_connections:
+            return
+        _pooled_connections.add(connection.connection)
+    counter = _request_connections.get()
+    if counter is not None:
+        counter[0] += 1
+
+
+class StaticFilesMiddleware(WhiteNoiseMiddleware):
+    """
+    WhiteNoiseMiddleware that is also async capable.
+
+    WhiteNoise's middleware is sync only. Under ASGI, Django then runs it and
+    every middleware and view below it on the single thread it keeps for
+    sync code, so all requests of a worker queue up one after another.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response=None, settings=settings):
+        super().__init__(get_response, settings)
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        return super().__call__(request)
+
+    async def __acall__(self, request):
+        if self.autorefresh:
+            # Touches the filesystem; only on with DEBUG
+            static_file = await sync_to_async(self.find_file, thread_sensitive=False)(request.path_info)
+        else:
+            static_file = self.files.get(request.path_info)
+        if static_file is not None:
+            return self.serve(static_file, request)
+        return await self.get_response(request)
 
 
 # Custom middleware to restrict admin access to admin users only
@@ -46,3 +120,212 @@ class LocalhostCOOPMiddleware:
             response['Cross-Origin-Opener-Policy'] = 'same-origin-allow-popups'
         
         return response
+
+
+class QueryBudgetExceeded(Exception):
+    """A view ran more queries than its QUERY_BUDGETS entry allows"""
+
+
+@contextmanager
+def timed(name):
+    """Add the time spent in the block to the current request's timings"""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings = _request_timings.get()
+        if timings is not None:
+            timings[name] = timings.get(name, 0.0) + time.perf_counter() - start
+
+
+# Records query count, SQL time, view time and render time for each request
+class RequestTimingMiddleware:
+    """
+    Emits a Server-Timing header and one structured log line per request,
+    and enforces QUERY_BUDGETS (URL name -> max queries): over budget is a
+    warning, or QueryBudgetExceeded when QUERY_BUDGET_STRICT is on (tests).
+
+    Goes last in MIDDLEWARE so the numbers cover the view itself. Queries
+    are only counted for sync views; async views run their queries in
+    worker threads with their own connections.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+
+        timings = {}
+        queries = {'count': 0, 'time': 0.0}
+
+        def count_queries(execute, sql, params, many, context):
+            start = time.perf_counter()
+            try:
+                return execute(sql, params, many, context)
+            finally:
+                queries['count'] += 1
+                queries['time'] += time.perf_counter() - start
+
+        connections = [0]
+        token = _request_timings.set(timings)
+        connections_token = _request_connections.set(connections)
+        start = time.perf_counter()
+        try:
+            with connection.execute_wrapper(count_queries):
+                response = self.get_response(request)
+        finally:
+            _request_timings.reset(token)
+            _request_connections.reset(connections_token)
+        self.record(request, response, time.perf_counter() - start, timings, queries, connections[0])
+        return response
+
+    async def __acall__(self, request):
+        timings = {}
+        # Seen from the worker threads too: sync_to_async copies the context
+        connections = [0]
+        token = _request_timings.set(timings)
+        connections_token = _request_connections.set(connections)
+        start = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            _request_timings.reset(token)
+            _request_connections.reset(connections_token)
+        self.record(request, response, time.perf_counter() - start, timings, None, connections[0])
+        return response
+
+    def record(self, request, response, elapsed, timings, queries, connections=0):
+        metrics = [('view', elapsed, None)]
+        if queries is not None:
+            metrics.append(('db', queries['time'], f"{queries['count']} queries"))
+        if connections:
+            # Should stay absent with persistent connections (CONN_MAX_AGE)
+            metrics.append(('db-connect', None, f'{connections} new'))
+        metrics.extend((name, duration, None) for name, duration in sorted(timings.items()))
+
+        response['Server-Timing'] = ', '.join(
+            name + (f';dur={duration * 1000:.1f}' if duration is not None else '') + (f';desc="{desc}"' if desc else '')
+            for name, duration, desc in metrics
+        )
+
+        match = request.resolver_match
+        url_name = match.url_name if match else None
+        entry = {
+            'event': 'request',
+            'method': request.method,
+            'path': request.path,
+            'url_name': url_name,
+            'status': response.status_code,
+            'view_ms': round(elapsed * 1000, 2),
+        }
+        if queries is not None:
+            entry['queries'] = queries['count']
+            entry['db_ms'] = round(queries['time'] * 1000, 2)
+        entry['connections'] = connections
+        for name, duration in timings.items():
+            entry[f'{name}_ms'] = round(duration * 1000, 2)
+
+        budget = getattr(settings, 'QUERY_BUDGETS', {}).get(url_name)
+        if queries is not None and budget is not None and queries['count'] > budget:
+            entry['query_budget'] = budget
+            message = f"{request.path} ran {queries['count']} queries (budget {budget})"
+            if getattr(settings, 'QUERY_BUDGET_STRICT', False):
+                raise QueryBudgetExceeded(message)
+            performance_logger.warning(json.dumps(entry))
+        else:
+            performance_logger.info(json.dumps(entry))
+
+
+# Serves the static export of the public pages (see app/export.py)
+class ExportedSiteMiddleware:
+    """
+    Answers the exported URLs from the files of the current export, through
+    WhiteNoise (precompressed variants, ETag/Last-Modified, HEAD and Range),
+    without running the view. Only used with EXPORT_SITE on.
+
+    An export is used while its manifest's version is the current content
+    version; otherwise the request goes on to the view (and, with
+    EXPORT_SITE_ON_SAVE, a re-export is scheduled). The hashed artifacts are
+    also served under EXPORT_URL with immutable caching.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not getattr(settings, 'EXPORT_SITE', False):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+        self.whitenoise = WhiteNoise(
+            None,
+            max_age=0,
+            allow_all_origins=False,
+            immutable_file_test=lambda path, url: url.startswith(EXPORT_URL),
+        )
+        # (manifest mtime, version, {url: (StaticFile, is_route)})
+        self._state = (None, None, {})
+
+    def lookup(self, request):
+        """Return (static_file, is_route, export version) for the request, or None"""
+        if request.method not in ('GET', 'HEAD'):
+            return None
+        try:
+            mtime = os.stat(manifest_path()).st_mtime_ns
+        except OSError:
+            return None
+        if mtime != self._state[0]:
+            self._state = self.load(mtime)
+        _mtime, version, files = self._state
+        entry = files.get(request.path_info)
+        return entry and (*entry, version)
+
+    def load(self, mtime):
+        manifest = read_manifest()
+        files = {}
+        if manifest:
+            for url, name in manifest['routes'].items():
+                path = str(EXPORT_ROOT / 'files' / name)
+                try:
+                    files[url] = (self.whitenoise.get_static_file(path, url), True)
+                    files[EXPORT_URL + name] = (self.whitenoise.get_static_file(path, EXPORT_URL + name), False)
+                except MissingFileError:
+                    # Half-pruned export; use the views until the next one
+                    return mtime, None, {}
+        return mtime, manifest and manifest['version'], files
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+
+        entry = self.lookup(request)
+        if entry:
+            static_file, is_route, version = entry
+            if not is_route or version == get_content_version():
+                return self.respond(static_file, is_route, request)
+            schedule_export()
+        return self.get_response(request)
+
+    async def __acall__(self, request):
+        entry = self.lookup(request)
+        if entry:
+            static_file, is_route, version = entry
+            if not is_route or version == await aget_content_version():
+                return self.respond(static_file, is_route, request)
+            schedule_export()
+        return await self.get_response(request)
+
+    @staticmethod
+    def respond(static_file, is_route, request):
+        response = WhiteNoiseMiddleware.serve(static_file, request)
+        if is_route:
+            response['X-Page-Cache'] = 'export'
+        return response
@@ -0,0 +1,83 @@
+# Generated by Django 5.2.6 on 2026-10-18 12:42
+
+from django.db import migrations, models
+
+
+def deactivate_extra_themes(apps, schema_editor):
+    """Keep only the most recently updated active theme active"""
+    ThemeSettings = apps.get_model('app', 'ThemeSettings')
+    active = ThemeSettings.objects.filter(is_active=True).order_by('-updated_at', '-pk')
+    keep = active.values_list('pk', flat=True).first()
+    if keep is not None:
+        active.exclude(pk=keep).update(is_active=False)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0015_remove_sitesettings_pinterest_url'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='education',
+            index=models.Index(condition=models.Q(('is_active', True)), fields=['order', '-start_date'], name='education_active_order_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='education',
+            index=models.Index(fields=['order', '-start_date'], name='education_order_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='experience',
+            index=models.Index(condition=models.Q(('is_active', True)), fields=['order', '-start_date'], name='experience_active_order_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='experience',
+            index=models.Index(fields=['order', '-start_date'], name='experience_order_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='landingpagesection',
+            index=models.Index(condition=models.Q(('is_active', True)), fields=['order', 'title'], name='section_active_order_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='landingpagesection',
+            index=models.Index(fields=['order', 'title'], name='section_order_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='project',
+            index=models.Index(condition=models.Q(('is_active', True)), fields=['order', '-created_at'], name='project_active_order_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='project',
+            index=models.Index(fields=['order', '-created_at'], name='project_order_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='service',
+            index=models.Index(condition=models.Q(('is_active', True)), fields=['order', 'title'], name='service_active_order_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='service',
+            index=models.Index(fields=['order', 'title'], name='service_order_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='skill',
+            index=models.Index(condition=models.Q(('is_active', True)), fields=['order', 'name'], name='skill_active_order_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='skill',
+            index=models.Index(fields=['order', 'name'], name='skill_order_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='testimonial',
+            index=models.Index(condition=models.Q(('is_active', True)), fields=['order', 'date'], name='testimonial_active_order_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='testimonial',
+            index=models.Index(fields=['order', 'date'], name='testimonial_order_idx'),
+        ),
+        migrations.RunPython(deactivate_extra_themes, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='themesettings',
+            constraint=models.UniqueConstraint(condition=models.Q(('is_active', True)), fields=('is_active',), name='themesettings_single_active'),
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 5.2.6 on 2026-10-18 12:46
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0016_content_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='project',
+            name='image_placeholders',
+            field=models.JSONField(blank=True, default=dict, editable=False, help_text='Tiny inline previews of the images, filled in after upload'),
+        ),
+        migrations.AddField(
+            model_name='sitesettings',
+            name='image_placeholders',
+            field=models.JSONField(blank=True, default=dict, editable=False, help_text='Tiny inline previews of the images, filled in after upload'),
+        ),
+        migrations.AddField(
+            model_name='testimonial',
+            name='image_placeholders',
+            field=models.JSONField(blank=True, default=dict, editable=False, help_text='Tiny inline previews of the images, filled in after upload'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.6 on 2026-10-18 13:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0017_image_placeholders'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='themesettings',
+            name='compiled_css',
+            field=models.CharField(blank=True, editable=False, help_text='Stylesheet compiled from this theme on save (see app/themecss.py)', max_length=255),
+        ),
+    ]
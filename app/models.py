@@ -1,5 +1,8 @@
+from django.core.files.storage import default_storage
 from django.db import models
 
+from .themecss import write_theme_css
+
 
 class ThemeSettings(models.Model):
     """Model to store website theme customization settings"""
@@ -35,11 +38,16 @@ class ThemeSettings(models.Model):
     
     # Custom CSS
     custom_css = models.TextField(blank=True, help_text="Custom CSS code")
+    compiled_css = models.CharField(max_length=255, blank=True, editable=False, help_text="Stylesheet compiled from this theme on save (see app/themecss.py)")
     
     class Meta:
         verbose_name = "Theme Settings"
         verbose_name_plural = "Theme Settings"
         ordering = ['-is_active', '-created_at']
+        constraints = [
+            # save() deactivates the other themes; this makes it a guarantee
+            models.UniqueConstraint(fields=['is_active'], condition=models.Q(is_active=True), name='themesettings_single_active'),
+        ]
     
     def __str__(self):
         return f"{self.name} {'(Active)' if self.is_active else ''}"
@@ -47,9 +55,16 @@ class ThemeSettings(models.Model):
     def save(self, *args, **kwargs):
         # Ensure only one theme is active at a time
         if self.is_active:
-            ThemeSettings.objects.filter(is_active=True).update(is_active=False)
+            ThemeSettings.objects.filter(is_active=True).exclude(pk=self.pk).update(is_active=False)
+        self.compiled_css = write_theme_css(self)
+        if kwargs.get('update_fields') is not None:
+            kwargs['update_fields'] = {*kwargs['update_fields'], 'compiled_css'}
         super().save(*args, **kwargs)
 
+    @property
+    def compiled_css_url(self):
+        return default_storage.url(self.compiled_css) if self.compiled_css else ''
+
 
 class SiteSettings(models.Model):
     """Model to store general site settings"""
@@ -126,6 +141,7 @@ class SiteSettings(models.Model):
     # SEO
     google_analytics_id = models.CharField(max_length=50, blank=True, help_text="Google Analytics ID")
     meta_image = models.ImageField(upload_to='meta/', blank=True, help_text="Meta image for social sharing")
+    image_placeholders = models.JSONField(default=dict, blank=True, editable=False, help_text="Tiny inline previews of the images, filled in after upload")
     
     # Features
     enable_blog = models.BooleanField(default=False, help_text="Enable blog section")
@@ -188,6 +204,12 @@ class Skill(models.Model):
         verbose_name = "Skill"
         verbose_name_plural = "Skills"
         ordering = ['order', 'name']
+        indexes = [
+            # Public pages: is_active rows in display order
+            models.Index(fields=['order', 'name'], condition=models.Q(is_active=True), name='skill_active_order_idx'),
+            # Admin changelist: every row in display order
+            models.Index(fields=['order', 'name'], name='skill_order_idx'),
+        ]
     
     def __str__(self):
         return f"{self.name} ({self.proficiency}%)"
@@ -199,6 +221,7 @@ class Project(models.Model):
     title = models.CharField(max_length=200, help_text="Project title")
     description = models.TextField(help_text="Project description")
     image = models.ImageField(upload_to='projects/', blank=True, help_text="Project image")
+    image_placeholders = models.JSONField(default=dict, blank=True, editable=False, help_text="Tiny inline previews of the images, filled in after upload")
     technologies = models.CharField(max_length=500, help_text="Technologies used (comma separated)")
     demo_url = models.URLField(blank=True, help_text="Demo URL")
     github_url = models.URLField(blank=True, help_text="GitHub URL")
@@ -210,6 +233,12 @@ class Project(models.Model):
         verbose_name = "Project"
         verbose_name_plural = "Projects"
         ordering = ['order', '-created_at']
+        indexes = [
+            # Public pages: is_active rows in display order
+            models.Index(fields=['order', '-created_at'], condition=models.Q(is_active=True), name='project_active_order_idx'),
+            # Admin changelist: every row in display order
+            models.Index(fields=['order', '-created_at'], name='project_order_idx'),
+        ]
     
     def __str__(self):
         return self.title
@@ -231,6 +260,12 @@ class Experience(models.Model):
         verbose_name = "Experience"
         verbose_name_plural = "Experiences"
         ordering = ['order', '-start_date']
+        indexes = [
+            # Public pages: is_active rows in display order
+            models.Index(fields=['order', '-start_date'], condition=models.Q(is_active=True), name='experience_active_order_idx'),
+            # Admin changelist: every row in display order
+            models.Index(fields=['order', '-start_date'], name='experience_order_idx'),
+        ]
     
     def __str__(self):
         return f"{self.title} at {self.company}"
@@ -252,6 +287,12 @@ class Education(models.Model):
         verbose_name = "Education"
         verbose_name_plural = "Education"
         ordering = ['order', '-start_date']
+        indexes = [
+            # Public pages: is_active rows in display order
+            models.Index(fields=['order', '-start_date'], condition=models.Q(is_active=True), name='education_active_order_idx'),
+            # Admin changelist: every row in display order
+            models.Index(fields=['order', '-start_date'], name='education_order_idx'),
+        ]
     
     def __str__(self):
         return f"{self.degree} from {self.institution}"
@@ -281,6 +322,12 @@ class LandingPageSection(models.Model):
         verbose_name = "Landing Page Section"
         verbose_name_plural = "Landing Page Sections"
         ordering = ['order', 'title']
+        indexes = [
+            # Public pages: is_active rows in display order
+            models.Index(fields=['order', 'title'], condition=models.Q(is_active=True), name='section_active_order_idx'),
+            # Admin changelist: every row in display order
+            models.Index(fields=['order', 'title'], name='section_order_idx'),
+        ]
     
     def __str__(self):
         return f"{self.title} ({self.get_section_type_display()})"
@@ -299,6 +346,12 @@ class Service(models.Model):
         verbose_name = "Service"
         verbose_name_plural = "Services"
         ordering = ['order', 'title']
+        indexes = [
+            # Public pages: is_active rows in display order
+            models.Index(fields=['order', 'title'], condition=models.Q(is_active=True), name='service_active_order_idx'),
+            # Admin changelist: every row in display order
+            models.Index(fields=['order', 'title'], name='service_order_idx'),
+        ]
     
     def __str__(self):
         return self.title
@@ -310,6 +363,7 @@ class Testimonial(models.Model):
     company = models.CharField(max_length=100, blank=True, help_text="Client's company (optional)")
     testimonial_text = models.TextField(help_text="The testimonial content")
     image = models.ImageField(upload_to='testimonials/', blank=True, null=True, help_text="Client's photo (optional)")
+    image_placeholders = models.JSONField(default=dict, blank=True, editable=False, help_text="Tiny inline previews of the images, filled in after upload")
     date = models.DateField(help_text="Date when the testimonial was given")
     rating = models.IntegerField(
         choices=[(i, i) for i in range(1, 6)],
@@ -323,6 +377,12 @@ class Testimonial(models.Model):
         ordering = ['order', 'date']
         verbose_name = "Testimonial"
         verbose_name_plural = "Testimonials"
+        indexes = [
+            # Public pages: is_active rows in display order
+            models.Index(fields=['order', 'date'], condition=models.Q(is_active=True), name='testimonial_active_order_idx'),
+            # Admin changelist: every row in display order
+            models.Index(fields=['order', 'date'], name='testimonial_order_idx'),
+        ]
     
     def __str__(self):
         return f"{self.name} - {self.company or self.position}"
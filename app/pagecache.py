@@ -0,0 +1,157 @@
+"""
+Rendered page cache for the public pages.
+
+Pages are stored as rendered bytes under a key that includes the content
+version, so a content edit never serves stale HTML as fresh. A copy of the
+last rendered page is also kept under a "latest" key: when the current
+version has no entry yet, one request takes a short lock in the cache and
+re-renders while everyone else is answered from that previous copy
+(single-flight, stale-while-revalidate).
+
+The lock and the entries live in the Django cache, so they are shared by
+every worker that shares the cache backend. The lock is a cache.add(),
+which is atomic on Redis (SET NX) and on the file cache (app.cache.FileCache,
+a hard link that only one worker can create). Since that cache can outlive a
+deploy, keys also carry a build id so a new template is never answered
+with HTML rendered by the old one.
+"""
+import asyncio
+import hashlib
+import os
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+
+# How long a rendered version stays in the cache (seconds)
+PAGE_CACHE_TIMEOUT = getattr(settings, 'PAGE_CACHE_TIMEOUT', 60 * 60 * 24)
+# How long the previous version is kept to answer with while re-rendering
+PAGE_CACHE_LATEST_TIMEOUT = None
+# Lifetime of the media URLs in a page, when they expire (presigned S3 URLs).
+# A URL may be up to half of it old when rendered (app/storage.py caches
+# them that long), so pages are kept for at most the other half.
+MEDIA_URL_MAX_AGE = getattr(settings, 'MEDIA_URL_MAX_AGE', None)
+if MEDIA_URL_MAX_AGE:
+    PAGE_CACHE_TIMEOUT = PAGE_CACHE_LATEST_TIMEOUT = min(PAGE_CACHE_TIMEOUT, MEDIA_URL_MAX_AGE // 2)
+# Upper bound on one regeneration; the lock expires after this (seconds)
+PAGE_CACHE_LOCK_TIMEOUT = getattr(settings, 'PAGE_CACHE_LOCK_TIMEOUT', 30)
+# How long a cached section of a page is kept (seconds); see app/content.py
+FRAGMENT_CACHE_TIMEOUT = getattr(settings, 'FRAGMENT_CACHE_TIMEOUT', PAGE_CACHE_TIMEOUT)
+if MEDIA_URL_MAX_AGE:
+    FRAGMENT_CACHE_TIMEOUT = min(FRAGMENT_CACHE_TIMEOUT, MEDIA_URL_MAX_AGE // 2)
+# How long a request with nothing to serve waits for another one's render (seconds)
+PAGE_CACHE_WAIT = getattr(settings, 'PAGE_CACHE_WAIT', 5)
+
+HIT = 'hit'
+STALE = 'stale'
+MISS = 'miss'
+
+
+_build_id = None
+
+
+def get_build_id():
+    """Identify the deployed templates: PAGE_CACHE_BUILD_ID, the deployed
+    commit, or else a fingerprint of the template files"""
+    global _build_id
+    if _build_id is None:
+        build_id = getattr(settings, 'PAGE_CACHE_BUILD_ID', None) or os.environ.get('RAILWAY_GIT_COMMIT_SHA')
+        if not build_id:
+            digest = hashlib.sha1()
+            for directory in settings.TEMPLATES[0]['DIRS']:
+                for root, dirs, files in sorted(os.walk(directory)):
+                    for file in sorted(files):
+                        stat = os.stat(os.path.join(root, file))
+                        digest.update(f'{root}/{file}:{stat.st_size}:{stat.st_mtime_ns}'.encode())
+            build_id = digest.hexdigest()
+        _build_id = build_id[:12]
+    return _build_id
+
+
+def _key(name, suffix):
+    return f'page:{name}:{get_build_id()}:{suffix}'
+
+
+def _store(name, page):
+    cache.set(_key(name, page['version']), page, timeout=PAGE_CACHE_TIMEOUT)
+    cache.set(_key(name, 'latest'), page, timeout=PAGE_CACHE_LATEST_TIMEOUT)
+
+
+def get_or_render_page(name, version, render):
+    """
+    Return ``(page, status)`` for the page called ``name`` at ``version``.
+
+    ``render`` is called with no arguments and must return a dict with
+    ``version``, ``content`` (bytes) and ``content_type``. ``status`` is
+    one of HIT, STALE or MISS.
+    """
+    page = cache.get(_key(name, version))
+    if page is not None:
+        return page, HIT
+
+    lock_key = _key(name, 'lock')
+    if cache.add(lock_key, version, timeout=PAGE_CACHE_LOCK_TIMEOUT):
+        try:
+            page = render()
+            _store(name, page)
+        finally:
+            cache.delete(lock_key)
+        return page, MISS
+
+    # Someone else is rendering this version: serve the previous copy
+    stale = cache.get(_key(name, 'latest'))
+    if stale is not None:
+        return stale, STALE
+
+    # Cold cache: wait for the other render rather than piling onto it
+    deadline = time.monotonic() + PAGE_CACHE_WAIT
+    while time.monotonic() < deadline:
+        time.sleep(0.05)
+        page = cache.get(_key(name, version))
+        if page is not None:
+            return page, HIT
+        if cache.get(lock_key) is None:
+            break
+
+    page = render()
+    _store(name, page)
+    return page, MISS
+
+
+
+async def _astore(name, page):
+    await cache.aset(_key(name, page['version']), page, timeout=PAGE_CACHE_TIMEOUT)
+    await cache.aset(_key(name, 'latest'), page, timeout=PAGE_CACHE_LATEST_TIMEOUT)
+
+
+async def aget_or_render_page(name, version, arender):
+    """Async variant of get_or_render_page(); ``arender`` is a coroutine function"""
+    page = await cache.aget(_key(name, version))
+    if page is not None:
+        return page, HIT
+
+    lock_key = _key(name, 'lock')
+    if await cache.aadd(lock_key, version, timeout=PAGE_CACHE_LOCK_TIMEOUT):
+        try:
+            page = await arender()
+            await _astore(name, page)
+        finally:
+            await cache.adelete(lock_key)
+        return page, MISS
+
+    stale = await cache.aget(_key(name, 'latest'))
+    if stale is not None:
+        return stale, STALE
+
+    deadline = time.monotonic() + PAGE_CACHE_WAIT
+    while time.monotonic() < deadline:
+        await asyncio.sleep(0.05)
+        page = await cache.aget(_key(name, version))
+        if page is not None:
+            return page, HIT
+        if await cache.aget(lock_key) is None:
+            break
+
+    page = await arender()
+    await _astore(name, page)
+    return page, MISS
@@ -0,0 +1,40 @@
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete
+
+from .content import bump_content_version
+from .events import notify_content_changed
+from .export import schedule_export
+from .images import IMAGE_FIELDS, pending_images, schedule_uploads
+from .models import ThemeSettings, SiteSettings, Skill, Project, Experience, Education, LandingPageSection, Service, Testimonial
+
+
+CONTENT_MODELS = (ThemeSettings, SiteSettings, Skill, Project, Experience, Education, LandingPageSection, Service, Testimonial)
+
+
+def content_changed(sender, **kwargs):
+    """Invalidate cached content whenever a content model is saved or deleted"""
+    # Only once the change is committed: a request that read the old rows in
+    # between would otherwise store them under the new version
+    def committed():
+        bump_content_version(sender)
+        notify_content_changed()
+        schedule_export()
+
+    transaction.on_commit(committed)
+
+
+for model in CONTENT_MODELS:
+    post_save.connect(content_changed, sender=model, dispatch_uid=f'content_changed_save_{model.__name__}')
+    post_delete.connect(content_changed, sender=model, dispatch_uid=f'content_changed_delete_{model.__name__}')
+
+
+def image_saved(sender, instance, **kwargs):
+    """Build derivatives and placeholders of newly uploaded images once the save is committed"""
+    fields = pending_images(instance)
+    if fields:
+        transaction.on_commit(lambda: schedule_uploads(instance, fields))
+
+
+for model in CONTENT_MODELS:
+    if model.__name__ in IMAGE_FIELDS:
+        post_save.connect(image_saved, sender=model, dispatch_uid=f'image_saved_{model.__name__}')
@@ -0,0 +1,135 @@
+"""
+S3-compatible media storage (AWS S3, MinIO, R2, ...), used for the default
+storage when ``MEDIA_STORAGE=s3`` (see settings.py).
+
+On top of django-storages' S3Storage:
+
+* uploads go through a TransferConfig built from settings, so large files
+  are sent as parallel multipart uploads, with a connection pool big enough
+  for the transfer threads;
+* ``url()`` results are kept in a per-process LRU. Unsigned URLs never
+  change; signed ones are reused for half of their lifetime. A page full of
+  images no longer signs (or, for ``ImageField.url``, re-normalises) every
+  name on every render;
+* ``exists_many()`` answers for a batch of names with one listing per
+  file stem (all the variants of an image) instead of one HEAD request per
+  name.
+"""
+import posixpath
+import threading
+import time
+from collections import OrderedDict, defaultdict
+
+from boto3.s3.transfer import TransferConfig
+from botocore.config import Config
+from django.conf import settings
+from storages.backends.s3 import S3Storage
+from storages.utils import clean_name
+
+MB = 1024 * 1024
+
+S3_MULTIPART_THRESHOLD = getattr(settings, 'S3_MULTIPART_THRESHOLD', 8 * MB)
+S3_MULTIPART_CHUNKSIZE = getattr(settings, 'S3_MULTIPART_CHUNKSIZE', 8 * MB)
+S3_MAX_CONCURRENCY = getattr(settings, 'S3_MAX_CONCURRENCY', 10)
+S3_URL_CACHE_SIZE = getattr(settings, 'S3_URL_CACHE_SIZE', 4096)
+
+
+class URLCache:
+    """Thread-safe LRU of url() arguments -> (url, expires at)"""
+
+    def __init__(self, size=S3_URL_CACHE_SIZE):
+        self.size = size
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return None
+            if entry[1] is not None and entry[1] <= time.monotonic():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return entry[0]
+
+    def set(self, key, url, ttl=None):
+        expires = None if ttl is None else time.monotonic() + ttl
+        with self._lock:
+            self._data[key] = (url, expires)
+            self._data.move_to_end(key)
+            while len(self._data) > self.size:
+                self._data.popitem(last=False)
+
+    def discard(self, name):
+        with self._lock:
+            for key in [key for key in self._data if key[0] == name]:
+                del self._data[key]
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+
+class CachedS3Storage(S3Storage):
+    def __init__(self, **options):
+        options.setdefault('transfer_config', TransferConfig(
+            multipart_threshold=S3_MULTIPART_THRESHOLD,
+            multipart_chunksize=S3_MULTIPART_CHUNKSIZE,
+            max_concurrency=S3_MAX_CONCURRENCY,
+        ))
+        super().__init__(**options)
+        # One pooled connection per transfer thread (botocore's default is 10)
+        self.client_config = self.client_config.merge(Config(
+            max_pool_connections=max(S3_MAX_CONCURRENCY, 10),
+        ))
+        self.url_cache = URLCache()
+
+    def url(self, name, parameters=None, expire=None, http_method=None):
+        key = (name, tuple(sorted(parameters.items())) if parameters else (), expire, http_method)
+        url = self.url_cache.get(key)
+        if url is None:
+            url = super().url(name, parameters, expire, http_method)
+            if self.querystring_auth:
+                ttl = (self.querystring_expire if expire is None else expire) / 2
+            else:
+                ttl = None
+            self.url_cache.set(key, url, ttl)
+        return url
+
+    def _save(self, name, content):
+        name = super()._save(name, content)
+        self.url_cache.discard(name)
+        return name
+
+    def delete(self, name):
+        super().delete(name)
+        self.url_cache.discard(name)
+
+    def exists_many(self, names):
+        """Return the subset of ``names`` that exist, listing each stem once"""
+        # Listed by "<directory>/<stem>." rather than the whole directory: the
+        # variants of one image share it, and a directory may hold thousands
+        # of other objects (one LIST request per 1000)
+        by_prefix = defaultdict(dict)
+        for name in names:
+            key = self._normalize_name(clean_name(name))
+            directory, basename = posixpath.split(key)
+            stem, dot, _rest = basename.partition('.')
+            by_prefix[posixpath.join(directory, stem + dot)][key] = name
+
+        paginator = self.connection.meta.client.get_paginator('list_objects_v2')
+        found = set()
+        for prefix, wanted in by_prefix.items():
+            for page in paginator.paginate(Bucket=self.bucket_name, Prefix=prefix, Delimiter='/'):
+                for entry in page.get('Contents', ()):
+                    if entry['Key'] in wanted:
+                        found.add(wanted[entry['Key']])
+        return found
+
+
+def exists_many(storage, names):
+    """``storage.exists()`` for a batch of names, in one go where the storage supports it"""
+    if hasattr(storage, 'exists_many'):
+        return storage.exists_many(names)
+    return {name for name in names if storage.exists(name)}
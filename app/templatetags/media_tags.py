@@ -0,0 +1,75 @@
+from django import template
+from django.core.files.storage import default_storage
+from django.utils.html import format_html, format_html_join
+
+from app.images import MIME_TYPES, get_manifest
+
+register = template.Library()
+
+
+def _srcset(variants):
+    return ', '.join(f'{default_storage.url(name)} {width}w' for width, name in variants)
+
+
+def placeholder(file):
+    """Inline preview data: URI stored for this image (app/images.py), if still current"""
+    entry = (getattr(file.instance, 'image_placeholders', None) or {}).get(file.field.name)
+    if entry and entry.get('name') == file.name:
+        return entry['data']
+    return None
+
+
+@register.simple_tag
+def responsive_image(file, alt='', sizes='100vw', loading='lazy', **attrs):
+    """
+    ``<img>`` for an uploaded image, with AVIF/WebP ``srcset`` sources when
+    its derivatives exist (app/images.py) and the original as fallback.
+    Lazy-loaded unless ``loading="eager"``; its inline placeholder is shown
+    behind it until it arrives.
+
+        {% responsive_image project.image alt=project.title class="work-img" sizes="(max-width: 768px) 100vw, 33vw" %}
+    """
+    attrs['loading'] = loading
+    attrs['decoding'] = 'async'
+    preview = placeholder(file)
+    if preview:
+        style = f"background: url('{preview}') center / cover no-repeat"
+        attrs['style'] = f"{attrs['style']}; {style}" if attrs.get('style') else style
+    img = format_html(
+        '<img src="{}" alt="{}"{}>',
+        file.url,
+        alt,
+        format_html_join('', ' {}="{}"', ((key.replace('_', '-'), value) for key, value in attrs.items())),
+    )
+    manifest = get_manifest(file.name)
+    if not manifest or not manifest['variants']:
+        return img
+
+    sources = format_html_join(
+        '',
+        '<source type="{}" srcset="{}" sizes="{}">',
+        ((MIME_TYPES[fmt], _srcset(variants), sizes) for fmt, variants in manifest['variants'].items()),
+    )
+    # display: contents keeps the <img> laid out (and styled) as before
+    return format_html('<picture style="display: contents">{}{}</picture>', sources, img)
+
+
+@register.simple_tag
+def derivative_url(file, width, fmt='webp'):
+    """URL of the widest ``fmt`` derivative no wider than ``width``, else the original (e.g. for CSS backgrounds)"""
+    manifest = get_manifest(file.name)
+    variants = manifest['variants'].get(fmt) if manifest else None
+    if not variants:
+        return file.url
+    fitting = [name for w, name in variants if w <= int(width)] or [variants[0][1]]
+    return default_storage.url(fitting[-1])
+
+
+@register.simple_tag
+def background_image(file, width):
+    """``background-image`` value: the best derivative over the inline placeholder"""
+    layers = [f"url('{derivative_url(file, width)}')"]
+    preview = placeholder(file)
+    if preview:
+        layers.append(f"url('{preview}')")
+    return ', '.join(layers)
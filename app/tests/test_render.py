@@ -0,0 +1,50 @@
+import shutil
+import tempfile
+
+from django.template.loader import get_template
+from django.test import TestCase, override_settings
+
+from app.content import build_snapshot
+from app.datagen import generate
+from app.models import Testimonial
+
+MEDIA_ROOT = tempfile.mkdtemp()
+CACHES = {
+    'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'tests'},
+    'shared': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'tests'},
+}
+
+
+@override_settings(CACHES=CACHES, MEDIA_ROOT=MEDIA_ROOT, QUERY_BUDGET_STRICT=True)
+class TestimonialsScalingTests(TestCase):
+    rows = 50
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(MEDIA_ROOT, ignore_errors=True)
+
+    def render_testimonials(self, rows):
+        Testimonial.objects.all().delete()
+        generate({'testimonials': rows})
+        return get_template('sections/testimonials.html').render(build_snapshot().as_context())
+
+    def test_each_testimonial_is_rendered_once(self):
+        # The loop's extra slides are cloned by main.js, not rendered
+        for rows in (self.rows, 2 * self.rows):
+            html = self.render_testimonials(rows)
+            self.assertEqual(html.count('class="testimonial-card swiper-slide"'), rows)
+
+    def test_output_grows_linearly(self):
+        single = len(self.render_testimonials(self.rows).encode())
+        double = len(self.render_testimonials(2 * self.rows).encode())
+        # Just under 2x: the section heading and controls are rendered once
+        self.assertAlmostEqual(double / single, 2, delta=0.2)
+        self.assertLessEqual(double, 2 * single)
+
+    def test_home_page_stays_within_its_query_budget(self):
+        # QUERY_BUDGET_STRICT turns a budget overrun into QueryBudgetExceeded
+        generate({'testimonials': 2 * self.rows})
+        response = self.client.get('/')
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'class="testimonial-card swiper-slide"', count=2 * self.rows)
@@ -0,0 +1,98 @@
+from unittest import mock
+
+import boto3
+from django.core.files.base import ContentFile
+from django.test import SimpleTestCase
+from moto import mock_aws
+from storages.backends.s3 import S3Storage
+
+from app.storage import CachedS3Storage, exists_many
+
+BUCKET = 'media'
+
+
+@mock_aws
+class CachedS3StorageTests(SimpleTestCase):
+    def setUp(self):
+        self.client = boto3.client('s3', region_name='us-east-1', aws_access_key_id='test', aws_secret_access_key='test')
+        self.client.create_bucket(Bucket=BUCKET)
+
+    def make_storage(self, **options):
+        options = {
+            'bucket_name': BUCKET,
+            'region_name': 'us-east-1',
+            'access_key': 'test',
+            'secret_key': 'test',
+            'querystring_auth': False,
+            **options,
+        }
+        return CachedS3Storage(**options)
+
+    def list_requests(self, storage):
+        """Record the Prefix of every ListObjectsV2 request ``storage`` sends"""
+        prefixes = []
+
+        def record(params, **kwargs):
+            prefixes.append(params['Prefix'])
+
+        storage.connection.meta.client.meta.events.register('provide-client-params.s3.ListObjectsV2', record)
+        return prefixes
+
+    def test_exists_many(self):
+        storage = self.make_storage()
+        for name in ('derivatives/projects/a.0123456789.320w.webp', 'derivatives/projects/a.0123456789.640w.webp'):
+            storage.save(name, ContentFile(b'x'))
+        names = [
+            'derivatives/projects/a.0123456789.320w.webp',
+            'derivatives/projects/a.0123456789.640w.webp',
+            'derivatives/projects/a.0123456789.960w.webp',
+            'derivatives/projects/b.0123456789.320w.webp',
+        ]
+
+        self.assertEqual(exists_many(storage, names), set(names[:2]))
+
+    def test_exists_many_lists_by_stem(self):
+        storage = self.make_storage()
+        # Other images in the same directory must not be listed
+        for i in range(50):
+            self.client.put_object(Bucket=BUCKET, Key=f'derivatives/projects/other{i}.0123456789.320w.webp', Body=b'x')
+        storage.save('derivatives/projects/a.0123456789.320w.webp', ContentFile(b'x'))
+        prefixes = self.list_requests(storage)
+
+        found = storage.exists_many([
+            'derivatives/projects/a.0123456789.320w.webp',
+            'derivatives/projects/a.0123456789.640w.webp',
+        ])
+
+        self.assertEqual(found, {'derivatives/projects/a.0123456789.320w.webp'})
+        self.assertEqual(prefixes, ['derivatives/projects/a.'])
+
+    def test_unsigned_urls_are_cached(self):
+        storage = self.make_storage()
+        with mock.patch.object(S3Storage, 'url', autospec=True, side_effect=S3Storage.url) as url:
+            first = storage.url('projects/a.png')
+            second = storage.url('projects/a.png')
+
+        self.assertEqual(first, second)
+        self.assertEqual(url.call_count, 1)
+        self.assertNotIn('Signature', first)
+
+    def test_signed_urls_are_reused_for_half_their_lifetime(self):
+        storage = self.make_storage(querystring_auth=True, querystring_expire=100)
+        with mock.patch('app.storage.time.monotonic', return_value=1000.0) as monotonic, \
+                mock.patch.object(S3Storage, 'url', autospec=True, side_effect=S3Storage.url) as url:
+            storage.url('projects/a.png')
+            monotonic.return_value = 1049.0
+            storage.url('projects/a.png')
+            self.assertEqual(url.call_count, 1)
+            monotonic.return_value = 1051.0
+            storage.url('projects/a.png')
+            self.assertEqual(url.call_count, 2)
+
+    def test_saving_discards_the_cached_url(self):
+        storage = self.make_storage()
+        storage.url('projects/a.png')
+
+        storage.save('projects/a.png', ContentFile(b'x'))
+
+        self.assertIsNone(storage.url_cache.get(('projects/a.png', (), None, None)))
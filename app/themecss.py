@@ -0,0 +1,183 @@
+"""
+Compiled theme stylesheet.
+
+Saving a ThemeSettings compiles it into one stylesheet: the custom properties
+ThemeManager used to set from JavaScript, hover and contrast shades derived
+from the colours, the animation and stars switches, and the sanitized
+custom_css. The file is written to the default storage as
+theme/theme.<hash>.css. index.html links it, so the first paint is already
+themed. An edit produces a new name, which is why the file can be cached for
+a year (see HASHED_NAME_RE in app/media.py).
+
+Files are never rewritten or deleted: pages rendered before an edit keep
+pointing at the stylesheet they were rendered with. Themes without a file
+(saved before compiled_css existed, or stored on a volume or bucket that has
+since changed) are compiled when the next content snapshot is built.
+"""
+import hashlib
+import logging
+import re
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+
+logger = logging.getLogger(__name__)
+
+THEME_CSS_DIR = 'theme'
+
+COLOR_FIELDS = ('primary', 'secondary', 'accent', 'background', 'text', 'card')
+# Colours that get -hover and -contrast shades
+SHADED_COLORS = ('primary', 'secondary', 'accent', 'card')
+HEX_COLOR_RE = re.compile(r'^#([0-9a-fA-F]{3}|[0-9a-fA-F]{6})$')
+FONT_NAME_RE = re.compile(r'[^\w \-]')
+CSS_ESCAPE_RE = re.compile(r'\\([0-9a-fA-F]{1,6}\s?|.)', re.S)
+HEX_ESCAPE_RE = re.compile(r'^[0-9a-fA-F]+$')
+
+# Constructs that load or run something, removed from custom_css. Comments
+# go first, since they could split a keyword ("exp/**/ression").
+UNSAFE_CSS = (
+    (re.compile(r'/\*.*?(\*/|$)', re.S), ''),
+    # Markup: a "</style>" would end the block if the CSS is ever inlined
+    (re.compile(r'<[^>]*>?'), ''),
+    (re.compile(r'@import\b[^;]*;?', re.I), ''),
+    (re.compile(r'\b(?:expression|javascript|vbscript)\s*[(:]', re.I), ''),
+    (re.compile(r'(?:-moz-binding|\bbehavior)\s*:[^;}]*;?', re.I), ''),
+    (re.compile(r'url\(\s*[\'"]?\s*data:(?!image/)[^)]*\)', re.I), 'none'),
+)
+
+
+def _strip_unsafe(css):
+    for pattern, replacement in UNSAFE_CSS:
+        css = pattern.sub(replacement, css)
+    return css
+
+
+def _unescape(css):
+    def decode(match):
+        escaped = match.group(1).strip()
+        if HEX_ESCAPE_RE.match(escaped):
+            code = int(escaped, 16)
+            return chr(code) if 0 < code <= 0x10FFFF else '\ufffd'
+        return escaped
+    return CSS_ESCAPE_RE.sub(decode, css)
+
+
+def sanitize_css(css):
+    """``css`` with anything that could load or run code removed"""
+    css = _strip_unsafe((css or '').replace('\x00', ''))
+    # Escapes are kept (content: "\f09a"), unless they spell one of the above
+    decoded = _unescape(css)
+    cleaned = _strip_unsafe(decoded)
+    return (cleaned if cleaned != decoded else css).strip()
+
+
+def parse_color(value, default):
+    """(r, g, b) of a #rgb / #rrggbb colour, or of ``default`` if invalid"""
+    match = HEX_COLOR_RE.match((value or '').strip()) or HEX_COLOR_RE.match(default)
+    digits = match.group(1)
+    if len(digits) == 3:
+        digits = ''.join(digit * 2 for digit in digits)
+    return tuple(int(digits[i:i + 2], 16) for i in (0, 2, 4))
+
+
+def to_hex(rgb):
+    return '#{:02x}{:02x}{:02x}'.format(*rgb)
+
+
+def mix(rgb, other, weight):
+    """``rgb`` moved ``weight`` (0-1) of the way towards ``other``"""
+    return tuple(round(a + (b - a) * weight) for a, b in zip(rgb, other))
+
+
+def luminance(rgb):
+    """WCAG relative luminance"""
+    channels = [c / 255 for c in rgb]
+    r, g, b = [c / 12.92 if c <= 0.03928 else ((c + 0.055) / 1.055) ** 2.4 for c in channels]
+    return 0.2126 * r + 0.7152 * g + 0.0722 * b
+
+
+def is_light(rgb):
+    # Above this luminance black text contrasts better than white
+    return luminance(rgb) > 0.179
+
+
+def font_stack(name, default, generic='sans-serif'):
+    name = FONT_NAME_RE.sub('', name or '').strip() or default
+    return f'"{name}", {generic}'
+
+
+def _default(theme, field):
+    return theme._meta.get_field(field).default
+
+
+def compile_theme_css(theme):
+    """The stylesheet for ``theme``; works with historical models too"""
+    colors = {
+        name: parse_color(getattr(theme, f'{name}_color'), _default(theme, f'{name}_color'))
+        for name in COLOR_FIELDS
+    }
+    properties = {f'--{name}-color': to_hex(rgb) for name, rgb in colors.items()}
+    properties['--body-color'] = properties['--background-color']
+    for name in SHADED_COLORS:
+        rgb = colors[name]
+        light = is_light(rgb)
+        properties[f'--{name}-hover'] = to_hex(mix(rgb, (0, 0, 0) if light else (255, 255, 255), 0.15))
+        properties[f'--{name}-contrast'] = '#000000' if light else '#ffffff'
+    properties['--text-muted'] = to_hex(mix(colors['text'], colors['background'], 0.35))
+    properties.update({
+        '--font-family': font_stack(theme.font_family, _default(theme, 'font_family')),
+        '--heading-font': font_stack(theme.heading_font, _default(theme, 'heading_font')),
+        '--font-size-base': f'{int(theme.font_size_base)}px',
+        '--sidebar-width': f'{int(theme.sidebar_width)}px',
+        '--border-radius': f'{int(theme.border_radius)}px',
+        '--spacing-unit': f'{int(theme.spacing_unit)}px',
+        '--animation-speed': f'{float(theme.animation_speed):g}',
+    })
+
+    # custom_css may contain non-ASCII characters (e.g. decoded escapes)
+    rules = ['@charset "UTF-8";', ':root {\n' + ''.join(f'    {name}: {value};\n' for name, value in properties.items()) + '}']
+    if not theme.enable_animations:
+        rules.append(
+            '*, *::before, *::after {\n'
+            '    animation-duration: 0s !important;\n'
+            '    animation-delay: 0s !important;\n'
+            '    transition-duration: 0s !important;\n'
+            '    transition-delay: 0s !important;\n'
+            '}'
+        )
+    if not theme.enable_stars:
+        rules.append('.stars { display: none; }')
+    custom_css = sanitize_css(theme.custom_css)
+    if custom_css:
+        rules.append(custom_css)
+    return '\n\n'.join(rules) + '\n'
+
+
+def write_theme_css(theme):
+    """Compile ``theme`` and store it; returns the file name, or '' on failure"""
+    try:
+        content = compile_theme_css(theme).encode()
+        name = f'{THEME_CSS_DIR}/theme.{hashlib.sha256(content).hexdigest()[:12]}.css'
+        if not default_storage.exists(name):
+            name = default_storage.save(name, ContentFile(content))
+        return name
+    except Exception:
+        # The page then falls back to ThemeManager applying the theme
+        logger.exception('Could not compile the stylesheet of theme %s', theme.pk)
+        return ''
+
+
+def ensure_theme_css(theme):
+    """Compile ``theme`` if its stylesheet is missing; returns the file name"""
+    try:
+        if theme.compiled_css and default_storage.exists(theme.compiled_css):
+            return theme.compiled_css
+    except Exception:
+        logger.exception('Could not check the stylesheet of theme %s', theme.pk)
+        return theme.compiled_css
+    name = write_theme_css(theme)
+    if name != theme.compiled_css:
+        # Not a content change: no signals, no version bump
+        type(theme).objects.filter(pk=theme.pk).update(compiled_css=name)
+        theme.compiled_css = name
+    return name
@@ -0,0 +1,87 @@
+"""
+Worker warm-up, run by gunicorn.conf.py before a worker accepts requests.
+
+A fresh worker would otherwise pay on its first requests for compiling
+index.html, building the content snapshot, opening its database connection
+and running its first readiness probe, which shows up as a latency spike
+after every deploy, restart and max_requests recycle.
+
+Database connections belong to the thread that opened them. Sync workers
+serve requests on the thread that warmed up; threaded (gthread) workers serve
+them from a pool, so each pool thread opens its own (warm_up_threads).
+"""
+import json
+import logging
+import threading
+import time
+from concurrent.futures import wait
+
+from asgiref.sync import async_to_sync, iscoroutinefunction
+from django.conf import settings
+from django.db import connection, connections
+from django.test import RequestFactory
+
+performance_logger = logging.getLogger('app.performance')
+
+# Pages rendered once per worker: templates, snapshot, page cache entries
+WARMUP_PATHS = getattr(settings, 'WARMUP_PATHS', ('/', '/api/theme/'))
+
+
+def warm_up():
+    """Prime this process's caches; returns the timings (ms) of each step"""
+    from django.urls import resolve
+
+    from .content import get_snapshot
+    from .health import database_probe
+    from .images import resume_pending_jobs
+
+    timings = {}
+
+    def step(name, func):
+        start = time.perf_counter()
+        try:
+            func()
+        except Exception:
+            # A cold worker is still better than one that never starts
+            performance_logger.exception('Warm-up step %s failed', name)
+        timings[name] = round((time.perf_counter() - start) * 1000, 2)
+
+    # Opens this thread's database connection (kept with CONN_MAX_AGE)
+    step('snapshot', get_snapshot)
+    factory = RequestFactory()
+    for path in WARMUP_PATHS:
+        def render(path=path):
+            # Straight to the view: no middleware, nothing logged as a request
+            view = resolve(path).func
+            if iscoroutinefunction(view):
+                view = async_to_sync(view)
+            view(factory.get(path))
+        step(path, render)
+    step('health', database_probe.get)
+    # Image jobs a restart interrupted; they run in the background
+    step('images', resume_pending_jobs)
+
+    performance_logger.info(json.dumps({'event': 'warmup', **{f'{name}_ms': ms for name, ms in timings.items()}}))
+    return timings
+
+
+def warm_up_threads(executor, threads):
+    """
+    Open a database connection on each of ``executor``'s ``threads`` threads
+    and close the one warm_up() left on this thread, which serves no requests.
+    Returns the time taken (ms).
+    """
+    start = time.perf_counter()
+    # Every task waits for the others, so the pool starts a thread per task
+    barrier = threading.Barrier(threads)
+
+    def connect():
+        barrier.wait(timeout=10)
+        connection.ensure_connection()
+
+    done, _pending = wait([executor.submit(connect) for _ in range(threads)], timeout=15)
+    for future in done:
+        if future.exception():
+            performance_logger.error('Warm-up of a worker thread failed: %s', future.exception())
+    connections.close_all()
+    return round((time.perf_counter() - start) * 1000, 2)
@@ -0,0 +1,20 @@
+"""
+ASGI config for the portfolio project.
+
+It exposes the ASGI callable as a module-level variable named ``application``.
+Needed for the streaming endpoints (e.g. /api/theme/stream/), which hold a
+connection open for each visitor.
+
+For more information on this file, see
+https://docs.djangoproject.com/en/4.2/howto/deployment/asgi/
+"""
+
+import os
+
+from django.core.asgi import get_asgi_application
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'settings')
+# Read by settings.py: no persistent database connections under ASGI
+os.environ['DJANGO_ASGI'] = 'True'
+
+application = get_asgi_application()
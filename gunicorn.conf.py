@@ -0,0 +1,109 @@
+"""
+Gunicorn configuration (picked up from the working directory; see Procfile).
+
+Workers are sized from the CPUs and memory the container actually gets
+(cgroup limits included). When memory allows fewer processes than the CPUs
+could keep busy, each worker gets threads instead. The app is preloaded in
+the master, so imports are shared copy-on-write. Workers are recycled after
+max_requests, with jitter so they don't all restart at once. Each new worker
+warms up (app/warmup.py) before it accepts requests, including a database
+connection per thread when it runs threads.
+
+Every value can be overridden from the environment, e.g. WEB_CONCURRENCY.
+"""
+import math
+import os
+
+# Resident memory of one warmed-up worker, with headroom (MB)
+WORKER_MEMORY_MB = int(os.environ.get('GUNICORN_WORKER_MEMORY_MB', 160))
+# Kept free for the master process and the rest of the container (MB)
+RESERVED_MEMORY_MB = int(os.environ.get('GUNICORN_RESERVED_MEMORY_MB', 128))
+MAX_THREADS = 4
+
+
+def _read(path):
+    try:
+        with open(path) as f:
+            return f.read().strip()
+    except OSError:
+        return None
+
+
+def cpu_limit():
+    """CPUs available to this process: affinity, capped by a cgroup CPU quota"""
+    cpus = len(os.sched_getaffinity(0)) if hasattr(os, 'sched_getaffinity') else (os.cpu_count() or 1)
+    quota = _read('/sys/fs/cgroup/cpu.max')  # cgroup v2: "<quota> <period>" or "max <period>"
+    if quota and not quota.startswith('max'):
+        limit, period = quota.split()
+        cpus = min(cpus, int(limit) / int(period))
+    else:
+        limit, period = _read('/sys/fs/cgroup/cpu/cpu.cfs_quota_us'), _read('/sys/fs/cgroup/cpu/cpu.cfs_period_us')
+        if limit and period and int(limit) > 0:
+            cpus = min(cpus, int(limit) / int(period))
+    return max(1, math.ceil(cpus))
+
+
+def memory_limit_mb():
+    """Memory available to the container: the cgroup limit, else MemAvailable"""
+    for path in ('/sys/fs/cgroup/memory.max', '/sys/fs/cgroup/memory/memory.limit_in_bytes'):
+        value = _read(path)
+        # cgroup v1 reports "no limit" as a huge number
+        if value and value.isdigit() and int(value) < 1 << 60:
+            return int(value) // (1024 * 1024)
+    meminfo = _read('/proc/meminfo') or ''
+    for line in meminfo.splitlines():
+        if line.startswith('MemAvailable:'):
+            return int(line.split()[1]) // 1024
+    return None
+
+
+def size_workers():
+    """(workers, threads): 2 * CPUs + 1 request handlers, as memory permits"""
+    wanted = 2 * cpu_limit() + 1
+    memory = memory_limit_mb()
+    fit = max(1, (memory - RESERVED_MEMORY_MB) // WORKER_MEMORY_MB) if memory else wanted
+    workers = min(wanted, fit)
+    threads = min(MAX_THREADS, math.ceil(wanted / workers))
+    return workers, threads
+
+
+_workers, _threads = size_workers()
+
+bind = f"0.0.0.0:{os.environ.get('PORT', '8000')}"
+workers = int(os.environ.get('WEB_CONCURRENCY', _workers))
+threads = int(os.environ.get('GUNICORN_THREADS', _threads))
+preload_app = os.environ.get('GUNICORN_PRELOAD', 'True').lower() == 'true'
+max_requests = int(os.environ.get('GUNICORN_MAX_REQUESTS', 1000))
+max_requests_jitter = int(os.environ.get('GUNICORN_MAX_REQUESTS_JITTER', max_requests // 10))
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', 30))
+graceful_timeout = int(os.environ.get('GUNICORN_GRACEFUL_TIMEOUT', 30))
+keepalive = int(os.environ.get('GUNICORN_KEEPALIVE', 5))
+# Heartbeat files in memory rather than on a possibly slow container disk
+worker_tmp_dir = '/dev/shm' if os.path.isdir('/dev/shm') else None
+accesslog = os.environ.get('GUNICORN_ACCESSLOG')
+
+
+def when_ready(server):
+    server.log.info('Serving with %s workers x %s threads (preload: %s)', workers, threads, preload_app)
+
+
+def pre_fork(server, worker):
+    # Sockets opened while preloading must not be shared with the workers
+    if preload_app:
+        from django.db import connections
+        connections.close_all()
+
+
+def post_worker_init(worker):
+    # Runs in the new worker, after the app is loaded and before it accepts
+    # requests: take the cold-start cost here instead of on a visitor
+    from app.warmup import warm_up
+
+    timings = warm_up()
+    # Threaded workers serve requests from their pool, not from this thread
+    pool = getattr(worker, 'tpool', None)
+    if pool is not None:
+        from app.warmup import warm_up_threads
+
+        timings['threads'] = warm_up_threads(pool, worker.cfg.threads)
+    worker.log.info('Worker %s warmed up in %.0f ms', worker.pid, sum(timings.values()))
@@ -32,8 +32,9 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    "app.health.HealthProbeMiddleware",  # keep first: probes skip everything below
     "django.middleware.security.SecurityMiddleware",
-    "whitenoise.middleware.WhiteNoiseMiddleware",  # Add WhiteNoise for static files
+    "app.middleware.StaticFilesMiddleware",  # WhiteNoise, usable under ASGI too
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
     "django.middleware.csrf.CsrfViewMiddleware",
@@ -43,8 +44,25 @@ MIDDLEWARE = [
     # "app.middleware.AdminAccessMiddleware",  # Temporarily disabled for testing
     # comment this out if you don't actually have it
     # "app.middleware.LocalhostCOOPMiddleware",
+    "app.middleware.ExportedSiteMiddleware",  # only active with EXPORT_SITE
+    "app.middleware.RequestTimingMiddleware",  # keep last: times the view itself
 ]
 
+# Most queries a view may run (by URL name) before RequestTimingMiddleware
+# complains. A cold home page / theme API builds the content snapshot
+# (~10 queries); warm requests should run none.
+QUERY_BUDGETS = {
+    "home": 15,
+    "theme_api": 15,
+    "healthcheck": 0,  # the database probe runs on its own thread
+}
+# Raise QueryBudgetExceeded instead of logging a warning (enable in tests)
+QUERY_BUDGET_STRICT = os.environ.get('QUERY_BUDGET_STRICT', 'False').lower() == 'true'
+
+# Readiness (/health/, /health/ready/) reuses one database probe per worker
+# for this many seconds; /health/live/ never touches the database
+HEALTH_PROBE_TTL = float(os.environ.get('HEALTH_PROBE_TTL', 5))
+
 ROOT_URLCONF = "urls"
 
 # ----------------------------------------------------
@@ -67,25 +85,107 @@ TEMPLATES = [
 ]
 
 WSGI_APPLICATION = "wsgi.application"
+ASGI_APPLICATION = "asgi.application"
+# Route "/" and "/api/theme/" to their async views; turn on when serving
+# asgi:application with uvicorn (see RAILWAY_DEPLOYMENT.md)
+ASYNC_VIEWS = os.environ.get("ASYNC_VIEWS", "False").lower() == "true"
 
 # ----------------------------------------------------
 # Database
 # ----------------------------------------------------
+# Connections are kept open between requests for DB_CONN_MAX_AGE seconds
+# (0 closes them after every request, as before) and checked before reuse.
+# DB_POOL=True switches PostgreSQL to a psycopg connection pool per worker
+# instead; Django requires CONN_MAX_AGE=0 with a pool.
+# Under ASGI (asgi.py sets DJANGO_ASGI) connections are always closed after
+# each request: ones opened in sync_to_async threads would never be cleaned
+# up. Use DB_POOL there to reuse connections.
+RUNNING_ASGI = os.environ.get('DJANGO_ASGI', 'False').lower() == 'true'
+DB_CONN_MAX_AGE = 0 if RUNNING_ASGI or ASYNC_VIEWS else int(os.environ.get('DB_CONN_MAX_AGE', 600))
+DB_CONN_HEALTH_CHECKS = os.environ.get('DB_CONN_HEALTH_CHECKS', 'True').lower() == 'true'
+DB_POOL = os.environ.get('DB_POOL', 'False').lower() == 'true'
+
 if os.environ.get('DATABASE_URL'):
     # Production database (Railway PostgreSQL)
     import dj_database_url
     DATABASES = {
-        'default': dj_database_url.parse(os.environ.get('DATABASE_URL'))
+        'default': dj_database_url.parse(
+            os.environ.get('DATABASE_URL'),
+            conn_max_age=DB_CONN_MAX_AGE,
+            conn_health_checks=DB_CONN_HEALTH_CHECKS,
+        )
     }
+    if DB_POOL and DATABASES['default']['ENGINE'] == 'django.db.backends.postgresql':
+        DATABASES['default']['CONN_MAX_AGE'] = 0
+        DATABASES['default'].setdefault('OPTIONS', {})['pool'] = {
+            'min_size': int(os.environ.get('DB_POOL_MIN_SIZE', 2)),
+            'max_size': int(os.environ.get('DB_POOL_MAX_SIZE', 10)),
+            # Seconds a request waits for a free connection before failing
+            'timeout': float(os.environ.get('DB_POOL_TIMEOUT', 10)),
+            # Recycle connections so PostgreSQL memory doesn't creep up
+            'max_lifetime': float(os.environ.get('DB_POOL_MAX_LIFETIME', 1800)),
+            'max_idle': float(os.environ.get('DB_POOL_MAX_IDLE', 300)),
+        }
 else:
     # Development database (SQLite)
     DATABASES = {
         "default": {
             "ENGINE": "django.db.backends.sqlite3",
             "NAME": BASE_DIR / "db.sqlite3",
+            "CONN_MAX_AGE": DB_CONN_MAX_AGE,
+            "CONN_HEALTH_CHECKS": DB_CONN_HEALTH_CHECKS,
         }
     }
 
+# ----------------------------------------------------
+# Cache
+# ----------------------------------------------------
+# CACHE_BACKEND selects the layout:
+#   tiered  per-worker LRU (L1) in front of a cache shared by all workers (L2)
+#   shared  the shared cache only
+#   locmem  per-process memory only (no sharing between workers)
+# The shared cache is Redis when REDIS_URL is set, otherwise files under
+# CACHE_DIR, which every worker on the same machine can see.
+CACHE_BACKEND = os.environ.get('CACHE_BACKEND', 'tiered')
+REDIS_URL = os.environ.get('REDIS_URL')
+
+if REDIS_URL:
+    SHARED_CACHE = {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': REDIS_URL,
+    }
+else:
+    SHARED_CACHE = {
+        # FileBasedCache with an atomic add(), for cross-worker locks
+        'BACKEND': 'app.cache.FileCache',
+        'LOCATION': os.environ.get('CACHE_DIR', str(BASE_DIR / '.cache')),
+        'OPTIONS': {'MAX_ENTRIES': int(os.environ.get('CACHE_MAX_ENTRIES', 5000))},
+    }
+
+if CACHE_BACKEND == 'locmem':
+    # Both aliases point at the same in-process store
+    CACHES = {
+        'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'portfolio'},
+        'shared': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'portfolio'},
+    }
+elif CACHE_BACKEND == 'shared':
+    CACHES = {'default': SHARED_CACHE, 'shared': SHARED_CACHE}
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'app.cache.TieredCache',
+            'OPTIONS': {
+                'L2': 'shared',
+                'L1_MAX_BYTES': int(os.environ.get('CACHE_L1_MAX_BYTES', 32 * 1024 * 1024)),
+                'L1_TIMEOUT': float(os.environ.get('CACHE_L1_TIMEOUT', 5)),
+            },
+        },
+        'shared': SHARED_CACHE,
+    }
+
+# The content version must be seen by every worker at once, so it skips L1
+CONTENT_VERSION_CACHE = 'shared'
+
 # ----------------------------------------------------
 # Password validation
 # ----------------------------------------------------
@@ -114,6 +214,14 @@ STATICFILES_DIRS = [BASE_DIR / "static"]
 # WhiteNoise configuration for static files
 STATICFILES_STORAGE = "whitenoise.storage.CompressedManifestStaticFilesStorage"
 
+# Static export of the public pages (manage.py export_site, app/export.py).
+# With EXPORT_SITE on, "/" and "/api/theme/" are answered from the export
+# while it matches the current content; EXPORT_SITE_ON_SAVE re-exports in
+# the background after every content change.
+EXPORT_ROOT = Path(os.environ.get("EXPORT_ROOT", BASE_DIR / "export"))
+EXPORT_SITE = os.environ.get("EXPORT_SITE", "False").lower() == "true"
+EXPORT_SITE_ON_SAVE = os.environ.get("EXPORT_SITE_ON_SAVE", str(EXPORT_SITE)).lower() == "true"
+
 # ----------------------------------------------------
 # Media files
 # ----------------------------------------------------
@@ -126,6 +234,43 @@ else:
     MEDIA_ROOT = BASE_DIR / "media"
     MEDIA_URL = "/media/"
 
+# MEDIA_STORAGE=s3 keeps uploads in an S3-compatible bucket (app/storage.py)
+# instead of MEDIA_ROOT, so several web instances can share them. Credentials
+# come from the usual AWS_ACCESS_KEY_ID / AWS_SECRET_ACCESS_KEY variables;
+# AWS_S3_ENDPOINT_URL points it at MinIO, R2 or a local moto server.
+MEDIA_STORAGE = os.environ.get("MEDIA_STORAGE", "filesystem")
+if MEDIA_STORAGE == "s3":
+    # Presigned URLs for a private bucket. They expire, so pages holding
+    # them are cached for at most half that time (MEDIA_URL_MAX_AGE, see
+    # app/pagecache.py) and the static export is disabled.
+    AWS_QUERYSTRING_AUTH = os.environ.get("AWS_QUERYSTRING_AUTH", "False").lower() == "true"
+    AWS_QUERYSTRING_EXPIRE = int(os.environ.get("AWS_QUERYSTRING_EXPIRE", 3600))
+    MEDIA_URL_MAX_AGE = AWS_QUERYSTRING_EXPIRE if AWS_QUERYSTRING_AUTH else None
+    STORAGES = {
+        "default": {
+            "BACKEND": "app.storage.CachedS3Storage",
+            "OPTIONS": {
+                "bucket_name": os.environ.get("AWS_STORAGE_BUCKET_NAME"),
+                "endpoint_url": os.environ.get("AWS_S3_ENDPOINT_URL"),
+                "region_name": os.environ.get("AWS_S3_REGION_NAME"),
+                "custom_domain": os.environ.get("AWS_S3_CUSTOM_DOMAIN"),
+                "location": os.environ.get("AWS_LOCATION", ""),
+                # Public bucket (or custom domain) by default: the URLs end up in
+                # cached pages, fragments and the static export
+                "querystring_auth": AWS_QUERYSTRING_AUTH,
+                "querystring_expire": AWS_QUERYSTRING_EXPIRE,
+                "file_overwrite": False,
+            },
+        },
+        "staticfiles": {
+            "BACKEND": "django.contrib.staticfiles.storage.StaticFilesStorage",
+        },
+    }
+    # Parallel multipart uploads (bytes / threads)
+    S3_MULTIPART_THRESHOLD = int(os.environ.get("S3_MULTIPART_THRESHOLD", 8 * 1024 * 1024))
+    S3_MULTIPART_CHUNKSIZE = int(os.environ.get("S3_MULTIPART_CHUNKSIZE", 8 * 1024 * 1024))
+    S3_MAX_CONCURRENCY = int(os.environ.get("S3_MAX_CONCURRENCY", 10))
+
 # ----------------------------------------------------
 # Default PK
 # ----------------------------------------------------
@@ -163,6 +308,10 @@ LOGGING = {
     "disable_existing_loggers": False,
     "handlers": {"console": {"class": "logging.StreamHandler"}},
     "root": {"handlers": ["console"], "level": "INFO"},
+    "loggers": {
+        # Per-request timing lines (app.middleware.RequestTimingMiddleware)
+        "app.performance": {"level": os.environ.get("PERFORMANCE_LOG_LEVEL", "INFO")},
+    },
 }
 
 # Production Security Settings
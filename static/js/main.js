@@ -136,7 +136,18 @@ document.addEventListener('DOMContentLoaded', function() {
         console.warn('No testimonial slides found. Add testimonials in admin.');
         return;
     }
-    
+
+    // Each testimonial is rendered once; repeat the slides here (first 3,
+    // then all of them) so the sliding loop never runs out of cards
+    const wrapper = swiperContainer.querySelector('.swiper-wrapper');
+    const appendClone = (slide) => {
+        const clone = slide.cloneNode(true);
+        clone.setAttribute('aria-hidden', 'true');
+        wrapper.appendChild(clone);
+    };
+    Array.from(slides).slice(0, 3).forEach(appendClone);
+    slides.forEach(appendClone);
+
     // Initialize Swiper after DOM is loaded
     let swiper = new Swiper(".testimonials-container", {
         spaceBetween: 24,
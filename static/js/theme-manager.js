@@ -2,13 +2,27 @@
 class ThemeManager {
     constructor() {
         this.themeData = null;
+        this.etag = null;
+        this.eventSource = null;
+        this.pollTimer = null;
         this.init();
     }
 
     async init() {
         try {
+            const stylesheet = document.getElementById('theme-css');
+            if (stylesheet) {
+                // The file can be missing (e.g. media storage switched): theme from JS instead
+                stylesheet.addEventListener('error', () => {
+                    stylesheet.dataset.failed = 'true';
+                    this.applyTheme();
+                });
+            }
             await this.loadTheme();
-            this.applyTheme();
+            // With the compiled stylesheet linked, the server already themed the page
+            if (!this.usesStylesheet()) {
+                this.applyTheme();
+            }
             this.setupThemeWatcher();
         } catch (error) {
             console.error('Failed to load theme:', error);
@@ -16,11 +30,27 @@ class ThemeManager {
     }
 
     async loadTheme() {
+        // The page embeds the /api/theme/ document it was rendered with
+        const inline = document.getElementById('theme-data');
+        if (inline) {
+            try {
+                this.themeData = JSON.parse(inline.textContent);
+                this.etag = document.documentElement.dataset.contentEtag || null;
+                return;
+            } catch (error) {
+                console.error('Invalid inline theme data:', error);
+            }
+        }
+        await this.fetchTheme();
+    }
+
+    async fetchTheme() {
         try {
-            const response = await fetch('/api/theme/');
+            const response = await fetch('/api/theme/', { cache: 'no-store' });
             if (!response.ok) {
                 throw new Error(`HTTP error! status: ${response.status}`);
             }
+            this.etag = response.headers.get('ETag');
             this.themeData = await response.json();
         } catch (error) {
             console.error('Error loading theme:', error);
@@ -75,9 +105,34 @@ class ThemeManager {
     applyTheme() {
         if (!this.themeData) return;
 
-        const root = document.documentElement;
         const theme = this.themeData;
 
+        if (this.usesStylesheet() && theme.stylesheet) {
+            // Compiled on the server: switch to the new file
+            const stylesheet = document.getElementById('theme-css');
+            if (stylesheet.getAttribute('href') !== theme.stylesheet) {
+                stylesheet.setAttribute('href', theme.stylesheet);
+            }
+        } else {
+            this.applyThemeProperties(theme);
+        }
+
+        // Update site content
+        this.updateSiteContent(theme.site);
+
+        // Update social links
+        this.updateSocialLinks(theme.site.social);
+    }
+
+    usesStylesheet() {
+        // The compiled stylesheet is linked and did not fail to load
+        const stylesheet = document.getElementById('theme-css');
+        return Boolean(stylesheet) && !stylesheet.dataset.failed;
+    }
+
+    applyThemeProperties(theme) {
+        const root = document.documentElement;
+
         // Apply CSS custom properties
         root.style.setProperty('--primary-color', theme.colors.primary);
         root.style.setProperty('--secondary-color', theme.colors.secondary);
@@ -117,12 +172,6 @@ class ThemeManager {
 
         // Apply custom CSS
         this.applyCustomCSS(theme.custom_css);
-
-        // Update site content
-        this.updateSiteContent(theme.site);
-
-        // Update social links
-        this.updateSocialLinks(theme.site.social);
     }
 
     applyCustomCSS(customCSS) {
@@ -198,27 +247,94 @@ class ThemeManager {
     }
 
     setupThemeWatcher() {
+        // Prefer the push channel; poll only while it is unavailable
+        if (window.EventSource) {
+            this.connectEventStream();
+        } else {
+            this.startPolling();
+        }
+    }
+
+    connectEventStream() {
+        const source = new EventSource('/api/theme/stream/');
+        this.eventSource = source;
+
+        source.addEventListener('open', () => this.stopPolling());
+
+        source.addEventListener('version', (event) => {
+            this.stopPolling();
+            const { etag } = JSON.parse(event.data);
+            if (etag !== this.etag) {
+                this.checkForUpdates();
+            }
+        });
+
+        source.addEventListener('error', () => {
+            // Keep the page current while the stream is down
+            this.startPolling();
+            if (source.readyState === EventSource.CLOSED) {
+                this.eventSource = null;
+                this.retryEventStream();
+            }
+        });
+    }
+
+    async retryEventStream() {
+        // EventSource hides why it gave up. A 204 means the server does not
+        // stream at all (WSGI): stay on polling rather than retrying forever
+        const controller = new AbortController();
+        try {
+            const response = await fetch('/api/theme/stream/', { signal: controller.signal, cache: 'no-store' });
+            controller.abort();
+            if (response.status === 204) {
+                return;
+            }
+        } catch (error) {
+            // Network trouble: try the stream again later
+        }
+        setTimeout(() => this.connectEventStream(), 60000);
+    }
+
+    startPolling() {
         // Poll for theme changes every 5 seconds
-        setInterval(async () => {
-            try {
-                const response = await fetch('/api/theme/');
-                if (response.ok) {
-                    const newThemeData = await response.json();
-                    if (JSON.stringify(newThemeData) !== JSON.stringify(this.themeData)) {
-                        this.themeData = newThemeData;
-                        this.applyTheme();
-                        // Theme updated successfully
-                    }
+        if (!this.pollTimer) {
+            this.pollTimer = setInterval(() => this.checkForUpdates(), 5000);
+        }
+    }
+
+    stopPolling() {
+        if (this.pollTimer) {
+            clearInterval(this.pollTimer);
+            this.pollTimer = null;
+        }
+    }
+
+    async checkForUpdates() {
+        // Conditional request: the server answers 304 with no body while
+        // the content version behind our ETag is unchanged
+        try {
+            const headers = this.etag ? { 'If-None-Match': this.etag } : {};
+            const response = await fetch('/api/theme/', { headers, cache: 'no-store' });
+            if (response.status === 304) {
+                return;
+            }
+            if (response.ok) {
+                this.etag = response.headers.get('ETag');
+                const newThemeData = await response.json();
+                if (JSON.stringify(newThemeData) !== JSON.stringify(this.themeData)) {
+                    this.themeData = newThemeData;
+                    this.applyTheme();
+                    // Theme updated successfully
                 }
-            } catch (error) {
-                console.error('Error checking for theme updates:', error);
             }
-        }, 5000);
+        } catch (error) {
+            console.error('Error checking for theme updates:', error);
+        }
     }
 
     // Method to manually refresh theme
     async refreshTheme() {
-        await this.loadTheme();
+        await this.fetchTheme();
         this.applyTheme();
     }
 }
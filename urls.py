@@ -2,22 +2,33 @@
 URL configuration for the portfolio app.
 """
 from django.contrib import admin
-from django.urls import path, include
+from django.urls import path, re_path, include
 from django.shortcuts import render
 from django.http import HttpResponse, JsonResponse
 from django.db import models
 from django.conf import settings
-from django.conf.urls.static import static
 
 # Import the views from app.views
-from app.views import theme_api, home_view, about_view, healthcheck, static_test, media_test
+from app.views import theme_api, atheme_api, home_view, ahome_view, about_view, static_test, media_test
+from app.health import liveness, readiness
+from app.events import content_events
+from app.media import serve_media
+
+# Under ASGI (uvicorn) the async views keep a worker's event loop free while
+# the content is loaded; under WSGI they would each need their own loop
+if settings.ASYNC_VIEWS:
+    home_view, theme_api = ahome_view, atheme_api
 
 urlpatterns = [
-    path("", home_view),
+    path("", home_view, name="home"),
     path("about/", about_view),
     path("api/theme/", theme_api, name="theme_api"),
-    path("health/", healthcheck, name="healthcheck"),
-    path("health", healthcheck, name="healthcheck_no_slash"),  # Add without trailing slash
+    path("api/theme/stream/", content_events, name="theme_events"),
+    # Normally answered by app.health.HealthProbeMiddleware before routing
+    path("health/", readiness, name="healthcheck"),
+    path("health", readiness, name="healthcheck_no_slash"),  # Add without trailing slash
+    path("health/live/", liveness, name="health_live"),
+    path("health/ready/", readiness, name="health_ready"),
     path("static-test/", static_test, name="static_test"),
     path("media-test/", media_test, name="media_test"),
     path('admin/', admin.site.urls),
@@ -25,5 +36,7 @@ urlpatterns = [
     path("favicon.ico", lambda request: HttpResponse(status=302, headers={'Location': '/static/favicon.ico'})),
 ]
 
-# Serve media files (static files are handled by WhiteNoise)
-urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
+# Serve media files in every environment (static files are handled by WhiteNoise)
+urlpatterns += [
+    re_path(rf"^{settings.MEDIA_URL.lstrip('/')}(?P<path>.+)$", serve_media, name="media"),
+]